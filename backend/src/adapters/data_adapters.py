@@ -10,7 +10,8 @@ import io
 import asyncio
 import logging
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -18,6 +19,19 @@ logger = logging.getLogger(__name__)
 class BaseDataAdapter(ABC):
     """Base class for all data adapters"""
     
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        # Shared, pooled HTTP session owned by DataLoaderModule (None until the app starts)
+        self.session = session
+    
+    @asynccontextmanager
+    async def _http_session(self):
+        """Yield the shared pooled session, or a short-lived one if none is attached"""
+        if self.session is not None and not self.session.closed:
+            yield self.session
+        else:
+            async with aiohttp.ClientSession() as session:
+                yield session
+    
     @abstractmethod
     async def load_data(self, config: Dict[str, Any]) -> pd.DataFrame:
         pass
@@ -39,7 +53,7 @@ class CSVAdapter(BaseDataAdapter):
                 return pd.read_csv(file_path, **config.get('read_csv_args', {}))
             elif url:
                 # Load from URL
-                async with aiohttp.ClientSession() as session:
+                async with self._http_session() as session:
                     async with session.get(url) as response:
                         content = await response.text()
                         return pd.read_csv(io.StringIO(content), **config.get('read_csv_args', {}))
@@ -63,7 +77,7 @@ class JSONAdapter(BaseDataAdapter):
                 with open(file_path, 'r') as f:
                     data = json.load(f)
             elif url:
-                async with aiohttp.ClientSession() as session:
+                async with self._http_session() as session:
                     async with session.get(url) as response:
                         data = await response.json()
             else:
@@ -94,7 +108,7 @@ class APIAdapter(BaseDataAdapter):
             # Convert boolean parameters to strings for API compatibility
             params = self._sanitize_params(params)
             
-            async with aiohttp.ClientSession() as session:
+            async with self._http_session() as session:
                 if method == 'GET':
                     async with session.get(url, params=params, headers=headers, timeout=timeout) as response:
                         return await self._handle_response(response, config)
@@ -108,6 +122,39 @@ class APIAdapter(BaseDataAdapter):
             self._log_error("load_data", e)
             return pd.DataFrame()
     
+    async def load_json(self, config: Dict[str, Any]) -> Optional[Any]:
+        """Load a JSON payload as parsed Python objects, skipping the DataFrame conversion
+
+        For callers that normalize nested responses themselves. Returns None on failure.
+        """
+        try:
+            url = config['url']
+            method = config.get('method', 'GET').upper()
+            if method not in ('GET', 'POST'):
+                raise ValueError(f"Unsupported HTTP method: {method}")
+            
+            async with self._http_session() as session:
+                async with session.request(
+                    method,
+                    url,
+                    json=config.get('data') if method == 'POST' else None,
+                    params=self._sanitize_params(config.get('params', {})),
+                    headers=config.get('headers', {}),
+                    timeout=config.get('timeout', 30)
+                ) as response:
+                    if response.status != 200:
+                        raise Exception(f"API request failed with status {response.status}")
+                    data = await response.json(content_type=None)
+            
+            data_key = config.get('data_key')
+            if data_key and isinstance(data, dict):
+                data = data.get(data_key, data)
+            return data
+            
+        except Exception as e:
+            self._log_error("load_json", e)
+            return None
+    
     def _sanitize_params(self, params: Dict[str, Any]) -> Dict[str, str]:
         """Convert parameter values to strings to avoid type issues"""
         sanitized = {}
@@ -6,6 +6,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
 import uvicorn
 import logging
+import os
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
@@ -15,11 +16,16 @@ import json
 from modules.data_loader import DataLoaderModule
 from modules.ai_analyzer import AIAnalyzerModule
 from modules.visualization import VisualizationModule
+from modules.snowflake_pool import SnowflakeConnectionPool
+from modules.scheduler import DataRefreshScheduler
 
 # Import services
 from services.dashboard_service import DashboardService
 from services.prompt_service import PromptService
 
+from utils.helpers import parse_windows
+from utils.http_cache import conditional_json_response
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -73,8 +79,14 @@ async def lifespan(app: FastAPI):
     logger.info("Initializing MCP Platform...")
     
     try:
-        app.state.data_loader = DataLoaderModule()
-        app.state.ai_analyzer = AIAnalyzerModule()
+        # One Snowflake connection pool shared by every module
+        app.state.snowflake_pool = SnowflakeConnectionPool.from_env()
+        app.state.data_loader = DataLoaderModule(snowflake_pool=app.state.snowflake_pool)
+        await app.state.data_loader.open_http_session()
+        app.state.data_loader.warm_up_snowflake()
+        app.state.ai_analyzer = AIAnalyzerModule(data_loader=app.state.data_loader)
+        # Checks OpenAI in the background; startup does not wait for it
+        app.state.ai_analyzer.start_health_probe()
         app.state.visualization = VisualizationModule()
         app.state.dashboard_service = DashboardService(
             app.state.data_loader,
@@ -85,6 +97,11 @@ async def lifespan(app: FastAPI):
             app.state.ai_analyzer,
             app.state.data_loader
         )
+        # Poll every source in the background so requests are served from the warm cache
+        app.state.scheduler = DataRefreshScheduler(app.state.data_loader)
+        app.state.scheduler.subscribe(app.state.dashboard_service.on_data_change)
+        if os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true':
+            app.state.scheduler.start()
         logger.info("All services initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}")
@@ -95,7 +112,10 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down MCP Platform...")
     try:
+        await app.state.scheduler.stop()
+        await app.state.ai_analyzer.close()
         await app.state.data_loader.close()
+        app.state.snowflake_pool.close()
     except Exception as e:
         logger.error(f"Error during shutdown: {e}")
 
@@ -157,7 +177,13 @@ async def list_mcp_tools(api_key: str = Depends(verify_mcp_api_key)):
                 "description": "Get real-time TFL transport data including delays and service status",
                 "inputSchema": {
                     "type": "object",
-                    "properties": {}
+                    "properties": {
+                        "modes": {
+                            "type": "string",
+                            "description": "Comma-separated TFL modes: tube, dlr, overground, elizabeth-line, tram, bus, river-bus",
+                            "default": "tube,overground,dlr"
+                        }
+                    }
                 }
             },
             {
@@ -192,6 +218,16 @@ async def list_mcp_tools(api_key: str = Depends(verify_mcp_api_key)):
                             "type": "number",
                             "description": "Analysis period in days", 
                             "default": 30
+                        },
+                        "windows": {
+                            "type": "string",
+                            "description": "Comma-separated moving-average windows in days, e.g. \"7,20,50,200\"; at most the retained trend history (about 214 by default)",
+                            "default": "7,30"
+                        },
+                        "ema": {
+                            "type": "boolean",
+                            "description": "Also return exponential moving averages for each window",
+                            "default": False
                         }
                     }
                 }
@@ -216,7 +252,10 @@ async def execute_mcp_tool(tool_name: str, arguments: dict = {}, api_key: str =
         data_loader = app.state.data_loader
         
         if tool_name == "get_transport_data":
-            data = await data_loader.load_transport_data()
+            try:
+                data = await data_loader.load_transport_data(arguments.get("modes"))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             result = _format_mcp_transport_data(data)
             
         elif tool_name == "get_financial_data":
@@ -229,8 +268,11 @@ async def execute_mcp_tool(tool_name: str, arguments: dict = {}, api_key: str =
             result = _format_mcp_weather_data(data)
             
         elif tool_name == "get_financial_trends":
-            data = await data_loader.load_financial_trend_data()
-            trends = data_loader._process_financial_trends(data)
+            try:
+                windows = parse_windows(arguments.get("windows"), max_window=data_loader.max_ma_window)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            trends = await data_loader.get_financial_trends(windows, bool(arguments.get("ema", False)))
             result = _format_mcp_trend_data(trends)
             
         elif tool_name == "get_combined_daily_data":
@@ -251,6 +293,8 @@ async def execute_mcp_tool(tool_name: str, arguments: dict = {}, api_key: str =
             ]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error executing tool {tool_name}: {str(e)}")
 
@@ -380,6 +424,9 @@ def _format_mcp_weather_data(data) -> str:
 
 def _format_mcp_trend_data(trends: dict) -> str:
     """Format trend data for MCP response"""
+    if not trends:
+        return "No financial trend data available"
+    
     output = ["📈 FINANCIAL TREND ANALYSIS", "=" * 50]
     output.append("📊 PERFORMANCE METRICS:")
     for metric in trends.get('performance_metrics', []):
@@ -387,6 +434,13 @@ def _format_mcp_trend_data(trends: dict) -> str:
     output.append("\n🏆 TOP STOCKS:")
     for stock in trends.get('stock_performance', [])[:3]:
         output.append(f"   • {stock['symbol']}: {stock['company']}")
+    moving_averages = trends.get('moving_averages', [])
+    if moving_averages:
+        latest = moving_averages[-1]
+        output.append(f"\n📉 MOVING AVERAGES ({latest['date']}):")
+        for key, value in latest.items():
+            if key.startswith(('price_', 'ema_')):
+                output.append(f"   • {key}: {'not enough history' if value is None else value}")
     return "\n".join(output)
 
 def _create_mcp_daily_report(transport, finance, weather) -> str:
@@ -431,9 +485,14 @@ async def health_check():
             "services": {
                 "api": "healthy",
                 "data_loader": "initialized",
-                "ai_analyzer": "initialized",
+                "ai_analyzer": app.state.ai_analyzer.health['status'],
                 "mcp": "enabled"
-            }
+            },
+            "cache": app.state.data_loader.get_cache_stats(),
+            "snowflake_pool": app.state.snowflake_pool.get_stats(),
+            "scheduler": app.state.scheduler.get_status(),
+            "ai": app.state.ai_analyzer.get_health(),
+            "prompt_cache": app.state.prompt_service.response_cache.get_stats()
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -464,8 +523,17 @@ async def api_info():
 
 # Add the missing financial trends endpoint with proper error handling
 @app.get("/api/financial-trends", response_model=FinancialTrendResponse)
-async def get_financial_trends(request: Request):
-    """Get financial trend analysis (separate from daily overview)"""
+async def get_financial_trends(request: Request, windows: Optional[str] = None, ema: bool = False):
+    """Get financial trend analysis (separate from daily overview)
+
+    windows: comma-separated moving-average windows in days (default "7,30")
+    ema: also include exponential moving averages for each window
+    """
+    try:
+        ma_windows = parse_windows(windows, max_window=request.app.state.data_loader.max_ma_window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         data_loader = request.app.state.data_loader
         
@@ -488,10 +556,9 @@ async def get_financial_trends(request: Request):
         }
         
         # Check if the dashboard service has the trend methods
-        if hasattr(data_loader, 'load_financial_trend_data') and hasattr(data_loader, '_process_financial_trends'):
+        if hasattr(data_loader, 'get_financial_trends'):
             try:
-                trend_data = await data_loader.load_financial_trend_data()
-                processed_trends = data_loader._process_financial_trends(trend_data)
+                processed_trends = await data_loader.get_financial_trends(ma_windows, ema)
                 
                 # Ensure processed_trends is not None and has the required structure
                 if processed_trends is None:
@@ -526,6 +593,10 @@ async def get_financial_trends(request: Request):
             logger.error(f"Processed trends is not a dict: {type(processed_trends)}")
             processed_trends = default_trend_data
         
+        # Hash computed once when the trend payload was rebuilt (the filled-in defaults
+        # above are constant, so it still identifies the response)
+        content_hash = processed_trends.pop('content_hash', None)
+        
         response_data = {
             "status": "success",
             "data": processed_trends,
@@ -533,7 +604,16 @@ async def get_financial_trends(request: Request):
         }
         
         logger.info(f"✅ Successfully returning trend data with keys: {list(processed_trends.keys())}")
-        return response_data
+        # Cacheable for as long as the trend analysis itself is cached (only rebuilt payloads
+        # carry a hash); fallbacks are only revalidated so real data shows up as soon as it loads
+        cacheable = content_hash is not None
+        return conditional_json_response(
+            request,
+            response_data,
+            max_age=data_loader.cache.ttls.get('trend_analysis', 0) if cacheable else 0,
+            stale_while_revalidate=data_loader.cache.stale_windows.get('trend_analysis', 0) if cacheable else 0,
+            content_hash=content_hash
+        )
         
     except Exception as e:
         logger.error(f"Unexpected error in financial trends endpoint: {e}")
@@ -1,78 +1,133 @@
 import openai
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+from typing import AsyncIterator, Dict, List, Any, Optional
 import logging
-from sqlalchemy import create_engine, text
 import os
-from datetime import datetime
+import time
+import random
+import asyncio
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from modules.data_loader import DataLoaderModule
+from modules.prompt_context import PromptContextBuilder
+from utils.helpers import get_company_sector
 
 logger = logging.getLogger(__name__)
 
+# Transient failures worth retrying; anything else (auth, bad request) fails at once
+RETRYABLE_OPENAI_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError
+)
+
 class AIAnalyzerModule:
-    def __init__(self):
-        # Use environment variable instead of hardcoded key
-        api_key = os.getenv("OPENAI_API_KEY")
-        self.client_available = False
-        self.client = None
-        
-        logger.info(f"Initializing OpenAI client with key: {api_key[:20]}...")
+    def __init__(self, data_loader: Optional[DataLoaderModule] = None):
+        # Use environment variable instead of hardcoded key. The client is created on
+        # first use and checked by a background probe, so construction never waits on OpenAI
+        self._api_key = os.getenv("OPENAI_API_KEY")
+        self.configured = bool(self._api_key) and self._api_key not in ['your-openai-key', 'dummy-key-for-development']
+        self._client: Optional[openai.AsyncOpenAI] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self.health_check_interval = float(os.getenv('OPENAI_HEALTH_CHECK_INTERVAL', '300'))
+        self.health = {
+            'status': 'unchecked' if self.configured else 'not_configured',
+            'last_checked': None,
+            'latency_ms': None,
+            'error': None
+        }
         
-        # Check if API key is provided
-        if api_key and api_key not in ['', 'your-openai-key', 'dummy-key-for-development']:
-            try:
-                # Initialize the new OpenAI client (v1.0+)
-                self.client = openai.OpenAI(api_key=api_key)
-                
-                # Test with a simple request instead of models.list()
-                test_response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": "Say 'hello'"}],
-                    max_tokens=5
-                )
-                
-                self.client_available = True
-                logger.info("✅ OpenAI client initialized successfully!")
-                
-            except openai.AuthenticationError as e:
-                logger.error(f"❌ Authentication failed: {e}")
-                logger.error("Please check your API key at https://platform.openai.com/api-keys")
-            except Exception as e:
-                logger.error(f"❌ Failed to initialize OpenAI client: {e}")
-                logger.error(f"Error type: {type(e).__name__}")
-        else:
+        if not self.configured:
             logger.warning("⚠️ OPENAI_API_KEY not configured")
         
-        # Initialize Snowflake connection
+        # At most this many completions in flight, so a burst of prompts queues here
+        # instead of tripping OpenAI rate limits
+        self.llm_semaphore = asyncio.Semaphore(int(os.getenv('OPENAI_MAX_CONCURRENCY', '4')))
+        self.llm_timeout = float(os.getenv('OPENAI_TIMEOUT', '30'))
+        self.llm_max_retries = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+        # Hard ceiling on the data part of a prompt, whatever the number of rows
+        self.context_builder = PromptContextBuilder(token_budget=int(os.getenv('AI_CONTEXT_TOKEN_BUDGET', '1500')))
+        
+        # The application's shared loader, so prompts reuse its caches, HTTP session
+        # and Snowflake pool instead of logging in again on every analysis
+        self.data_loader = data_loader or DataLoaderModule()
+    
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        if self._client is None:
+            # Retries are done in _chat_completion, with jitter and the shared limit
+            self._client = openai.AsyncOpenAI(api_key=self._api_key, max_retries=0)
+        return self._client
+    
+    @property
+    def client_available(self) -> bool:
+        """Use the AI path unless the key is missing or the last probe failed"""
+        return self.configured and self.health['status'] in ('unchecked', 'healthy')
+    
+    def start_health_probe(self):
+        """Check OpenAI in the background now and every health_check_interval seconds"""
+        if self.configured and self._probe_task is None:
+            self._probe_task = asyncio.create_task(self._probe_loop(), name="openai-health-probe")
+    
+    async def check_health(self) -> Dict[str, Any]:
+        """Probe OpenAI with a models lookup, which costs no tokens"""
+        started = time.monotonic()
         try:
-            snowflake_user = os.getenv('SNOWFLAKE_USER')
-            snowflake_password = os.getenv('SNOWFLAKE_PASSWORD')
-            snowflake_account = os.getenv('SNOWFLAKE_ACCOUNT')
-            
-            if all([snowflake_user, snowflake_password, snowflake_account]):
-                self.snowflake_engine = create_engine(
-                    f"snowflake://{snowflake_user}:{snowflake_password}@"
-                    f"{snowflake_account}/{os.getenv('SNOWFLAKE_DATABASE', 'MCP_PLATFORM')}/"
-                    f"{os.getenv('SNOWFLAKE_SCHEMA', 'PUBLIC')}"
-                    f"?warehouse={os.getenv('SNOWFLAKE_WAREHOUSE', 'MCP_WAREHOUSE')}"
-                )
-                logger.info("✅ Snowflake engine initialized successfully")
-            else:
-                logger.warning("⚠️ Snowflake credentials not fully configured")
-                self.snowflake_engine = None
+            await asyncio.wait_for(self.client.models.retrieve("gpt-3.5-turbo"), timeout=self.llm_timeout)
+            status, error = 'healthy', None
+        except asyncio.CancelledError:
+            raise
+        except openai.AuthenticationError as e:
+            logger.error(f"❌ OpenAI authentication failed: {e}")
+            status, error = 'unauthorized', str(e)
         except Exception as e:
-            logger.error(f"❌ Failed to initialize Snowflake engine: {e}")
-            self.snowflake_engine = None
+            logger.warning(f"OpenAI health probe failed: {type(e).__name__}: {e}")
+            status, error = 'unavailable', f"{type(e).__name__}: {e}"
+        
+        if status == 'healthy' and self.health['status'] != 'healthy':
+            logger.info("✅ OpenAI client available")
+        self.health = {
+            'status': status,
+            'last_checked': datetime.utcnow().isoformat(),
+            'latency_ms': round((time.monotonic() - started) * 1000),
+            'error': error
+        }
+        return self.health
     
-    async def analyze_data(self, prompt: str, sector: str) -> Dict[str, Any]:
-        """Analyze data based on user prompt and sector"""
+    def get_health(self) -> Dict[str, Any]:
+        return dict(self.health)
+    
+    async def close(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+    
+    async def _probe_loop(self):
+        while True:
+            health = await self.check_health()
+            # Recheck sooner while unhealthy so a transient outage clears quickly
+            healthy = health['status'] == 'healthy'
+            await asyncio.sleep(self.health_check_interval if healthy else min(self.health_check_interval, 30))
+    
+    async def analyze_data(self, prompt: str, sector: str, data: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """Analyze data based on user prompt and sector
+
+        Pass `data` when the caller has already loaded the sector, so the analysis
+        describes the same snapshot and nothing is fetched twice.
+        """
         try:
             logger.info(f"📊 Analyzing: '{prompt}' for {sector}")
 
-            
-            
             # Get relevant data
-            data = await self._get_sector_data(sector)
+            if data is None:
+                data = await self._get_sector_data(sector)
 
             print(data)
 
@@ -84,21 +139,31 @@ class AIAnalyzerModule:
 
           
             # Generate insights based on whether OpenAI is available
+            ai_used = False
+            error = None
             if self.client_available:
                 logger.info("🤖 Using AI-powered analysis")
-                insights = await self._generate_ai_insights(prompt, data, sector)
-                recommendations = await self._generate_ai_recommendations(insights, sector)
-                ai_used = True
-            else:
+                try:
+                    insights = await self._generate_ai_insights(prompt, data, sector)
+                    recommendations = await self._generate_ai_recommendations(insights, sector)
+                    ai_used = True
+                except Exception as e:
+                    logger.error(f"❌ AI analysis failed, falling back to basic analysis: {e}")
+                    error = str(e)
+            if not ai_used:
                 logger.info("📋 Using basic analysis")
                 insights = self._generate_basic_insights(prompt, data, sector)
                 recommendations = self._generate_basic_recommendations(sector)
-                ai_used = False
+            
+            if sector == 'transportation':
+                predictions = self._generate_delay_predictions(await self._get_transport_history())
+                if predictions:
+                    insights = f"{insights}\n\n" + "\n".join(predictions)
             
             # Ensure data is serializable
             serializable_data = data.to_dict('records') if hasattr(data, 'to_dict') and not data.empty else []
             
-            return {
+            result = {
                 'data': serializable_data,
                 'insights': insights,
                 'recommendations': recommendations,
@@ -106,79 +171,199 @@ class AIAnalyzerModule:
                 'sector': sector,
                 'timestamp': datetime.now().isoformat()
             }
+            if error is not None:
+                # Answered, but by the basic fallback after the model failed
+                result['error'] = error
+            return result
             
         except Exception as e:
             logger.error(f"❌ Error analyzing data for {sector}: {e}")
             return await self._get_fallback_response(prompt, sector, str(e))
     
+    async def stream_analysis(self, prompt: str, sector: str, data: Optional[pd.DataFrame] = None) -> AsyncIterator[Dict[str, Any]]:
+        """analyze_data as a stream of events
+
+        Yields {'type': 'insight', 'delta': ...} chunks as the model produces them
+        (one chunk in basic mode), then {'type': 'recommendations', ...} once. If the
+        model stream fails, the recommendations event carries the 'error' and whether
+        the insights are a 'partial' model answer or the basic fallback.
+        """
+        logger.info(f"📊 Streaming analysis: '{prompt}' for {sector}")
+        if data is None:
+            data = await self._get_sector_data(sector)
+        if sector == 'finance' and 'SYMBOL' in data:
+            # Get latest entry for each symbol
+            data = data.drop_duplicates(subset=['SYMBOL'], keep='first')
+        
+        insights = ''
+        error = None
+        ai_used = self.client_available
+        if ai_used:
+            try:
+                # aclosing: if our consumer stops early, the upstream stream closes now, not at GC
+                async with aclosing(self._stream_chat_completion(self._insight_messages(prompt, data, sector), max_tokens=500)) as deltas:
+                    async for delta in deltas:
+                        insights += delta
+                        yield {'type': 'insight', 'delta': delta}
+            except Exception as e:
+                logger.error(f"❌ Error streaming AI insights: {e}")
+                # Keep a partial answer; fall back to basic analysis only if nothing arrived
+                error = str(e)
+                ai_used = bool(insights)
+        
+        if not insights:
+            insights = self._generate_basic_insights(prompt, data, sector)
+            yield {'type': 'insight', 'delta': insights}
+        
+        if sector == 'transportation':
+            predictions = self._generate_delay_predictions(await self._get_transport_history())
+            if predictions:
+                delta = "\n\n" + "\n".join(predictions)
+                insights += delta
+                yield {'type': 'insight', 'delta': delta}
+        
+        recommendations = None
+        if ai_used:
+            try:
+                recommendations = await self._generate_ai_recommendations(insights, sector)
+            except Exception as e:
+                logger.error(f"❌ Error generating AI recommendations: {e}")
+                error = str(e)
+        if recommendations is None:
+            recommendations = self._generate_basic_recommendations(sector)
+        event = {'type': 'recommendations', 'recommendations': recommendations, 'ai_used': ai_used}
+        if error is not None:
+            event.update(error=error, partial=ai_used)
+        yield event
+    
     async def _generate_ai_insights(self, prompt: str, data: pd.DataFrame, sector: str) -> str:
-        """Generate insights using OpenAI"""
-        try:
-            # Prepare data sample for the AI
-            if not data.empty:
-                # data_sample = f"Data sample ({len(data)} records): {data.head(2).to_dict('records')}"
-                data_sample = f"Complete recent data ({len(data)} lines): {data.to_dict('records')}"
-            else:
-                data_sample = "No data available"
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": f"""You are a data analyst specializing in {sector} data. 
-                        Provide clear, insightful analysis based on the provided data."""
-                    },
-                    {
-                        "role": "user", 
-                        "content": f"""User query: {prompt}
-                        
-                        {data_sample}
-                        
-                        Please provide a comprehensive analysis with key insights."""
-                    }
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            logger.error(f"❌ Error generating AI insights: {e}")
-            return self._generate_basic_insights(prompt, data, sector)
+        """Generate insights using OpenAI; failures propagate so callers can report the fallback"""
+        return await self._chat_completion(
+            messages=self._insight_messages(prompt, data, sector),
+            max_tokens=500
+        )
+    
+    def _insight_messages(self, prompt: str, data: pd.DataFrame, sector: str) -> List[Dict[str, str]]:
+        # Statistics, notable records and relevant columns only, within the token budget
+        data_sample = self.context_builder.build(data, sector, prompt)
+        
+        return [
+            {
+                "role": "system", 
+                "content": f"""You are a data analyst specializing in {sector} data. 
+                Provide clear, insightful analysis based on the provided data."""
+            },
+            {
+                "role": "user", 
+                "content": f"""User query: {prompt}
+                
+                {data_sample}
+                
+                Please provide a comprehensive analysis with key insights."""
+            }
+        ]
     
     async def _generate_ai_recommendations(self, insights: str, sector: str) -> List[str]:
-        """Generate recommendations using OpenAI"""
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"""You are a business consultant specializing in {sector}.
-                        Provide 3 actionable recommendations based on the insights."""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Insights: {insights}\n\nProvide 3 actionable recommendations:"
-                    }
-                ],
-                max_tokens=200,
-                temperature=0.7
-            )
-            
-            recommendations_text = response.choices[0].message.content
-            recommendations = [
-                rec.strip().lstrip('-• ') 
-                for rec in recommendations_text.split('\n') 
-                if rec.strip()
-            ]
-            return recommendations[:3]
+        """Generate recommendations using OpenAI; failures propagate like _generate_ai_insights"""
+        recommendations_text = await self._chat_completion(
+            messages=[
+                {
+                    "role": "system",
+                    "content": f"""You are a business consultant specializing in {sector}.
+                    Provide 3 actionable recommendations based on the insights."""
+                },
+                {
+                    "role": "user",
+                    "content": f"Insights: {insights}\n\nProvide 3 actionable recommendations:"
+                }
+            ],
+            max_tokens=200
+        )
+        recommendations = [
+            rec.strip().lstrip('-• ') 
+            for rec in recommendations_text.split('\n') 
+            if rec.strip()
+        ]
+        return recommendations[:3]
+    
+    async def _chat_completion(self, messages: List[Dict[str, str]], max_tokens: int,
+                               temperature: float = 0.7, model: str = "gpt-3.5-turbo") -> str:
+        """One chat completion on the async client, bounded by the shared semaphore
+
+        Each attempt is limited to llm_timeout seconds. Transient failures are
+        retried with jittered exponential backoff, outside the semaphore so a
+        waiting retry does not hold a slot. Cancelling the caller (e.g. the HTTP
+        client disconnected) cancels the in-flight request.
+        """
+        for attempt in range(self.llm_max_retries + 1):
+            try:
+                async with self.llm_semaphore:
+                    response = await asyncio.wait_for(
+                        self.client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            max_tokens=max_tokens,
+                            temperature=temperature
+                        ),
+                        timeout=self.llm_timeout
+                    )
+                return response.choices[0].message.content
+            except RETRYABLE_OPENAI_ERRORS as e:
+                if attempt == self.llm_max_retries:
+                    raise
+                await self._backoff(attempt, e)
+    
+    async def _stream_chat_completion(self, messages: List[Dict[str, str]], max_tokens: int,
+                                      temperature: float = 0.7, model: str = "gpt-3.5-turbo") -> AsyncIterator[str]:
+        """Yield the completion's content deltas as they arrive
+
+        Opening the stream is retried like _chat_completion; once tokens flow a
+        failure is raised to the caller. The semaphore slot is held until the
+        stream ends, and closing this generator early (client disconnected)
+        closes the upstream stream.
+        """
+        for attempt in range(self.llm_max_retries + 1):
+            await self.llm_semaphore.acquire()
+            try:
+                stream = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        stream=True
+                    ),
+                    timeout=self.llm_timeout
+                )
+            except RETRYABLE_OPENAI_ERRORS as e:
+                self.llm_semaphore.release()
+                if attempt == self.llm_max_retries:
+                    raise
+                await self._backoff(attempt, e)
+                continue
+            except BaseException:
+                self.llm_semaphore.release()
+                raise
             
-        except Exception as e:
-            logger.error(f"❌ Error generating AI recommendations: {e}")
-            return self._generate_basic_recommendations(sector)
+            try:
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        # llm_timeout also bounds the gap between two chunks
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.llm_timeout)
+                    except StopAsyncIteration:
+                        return
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        yield delta
+            finally:
+                self.llm_semaphore.release()
+                await stream.close()
+    
+    async def _backoff(self, attempt: int, error: Exception):
+        delay = min(2 ** attempt, 8) * random.uniform(0.5, 1.5)
+        logger.warning(f"OpenAI call failed ({type(error).__name__}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
     
     def _generate_basic_insights(self, prompt: str, data: pd.DataFrame, sector: str) -> str:
         """Generate basic insights without AI"""
@@ -272,11 +457,7 @@ class AIAnalyzerModule:
         sample_data = {}
 
         try:
-            # Import DataLoaderModule directly
-            from modules.data_loader import DataLoaderModule
-            # Create a new instance of DataLoaderModule
-            data_loader = DataLoaderModule()
-
+            data_loader = self.data_loader
             
             if sector == 'transportation':
                 real_data = await data_loader.load_transport_data()
@@ -419,18 +600,7 @@ class AIAnalyzerModule:
 
     def _get_company_sector(self, symbol: str) -> str:
         """Get company sector for categorization"""
-        sectors = {
-            'HSBA.L': 'Banking',
-            'BARC.L': 'Banking', 
-            'LLOY.L': 'Banking',
-            'BP.L': 'Energy',
-            'RIO.L': 'Mining',
-            'GSK.L': 'Pharmaceuticals',
-            'AZN.L': 'Pharmaceuticals',
-            'ULVR.L': 'Consumer Goods',
-            'TSCO.L': 'Retail'
-        }
-        return sectors.get(symbol, 'Other')
+        return get_company_sector(symbol)
 
     def _get_market_summary(self, performance_data: List[Dict]) -> Dict:
         """Generate market summary"""
@@ -478,7 +648,8 @@ class AIAnalyzerModule:
                 "Contact support if issue persists"
             ],
             'ai_used': False,
-            'sector': sector
+            'sector': sector,
+            'error': error
         }
     
 
@@ -623,9 +794,13 @@ class AIAnalyzerModule:
 
 
 
+    async def _get_transport_history(self) -> pd.DataFrame:
+        """Recorded line statuses from the last 3 days"""
+        return await self.data_loader.get_transport_history(hours=72)
+
     def _generate_delay_predictions(self, data: pd.DataFrame) -> List[str]:
         
-        """Generate simple delay predictions based on historical patterns"""
+        """Generate simple delay predictions from recorded transport history (see _get_transport_history)"""
         insights = []
         
         if data.empty:
@@ -5,7 +5,6 @@ import os
 import aiohttp
 import httpx
 import pandas as pd
-import snowflake.connector
 from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 from mcp.server import Server
@@ -14,6 +13,12 @@ import mcp.server.stdio
 import mcp.types as types
 import logging
 from dotenv import load_dotenv
+from snowflake.connector.errors import NotSupportedError, ProgrammingError
+
+try:
+    from modules.snowflake_pool import SnowflakeConnectionPool
+except ImportError:  # Run directly as a script from the modules directory
+    from snowflake_pool import SnowflakeConnectionPool
 
 # Load environment variables
 load_dotenv()
@@ -26,24 +31,8 @@ class SimplifiedDataLoader:
     """Simplified data loader without adapters dependency"""
     
     def __init__(self):
-        self.snowflake_conn = self._init_snowflake()
-    
-    def _init_snowflake(self):
-        """Initialize Snowflake connection"""
-        try:
-            conn = snowflake.connector.connect(
-                user='SENIORMAN',
-                password='Seniorman007123$',
-                account='jibmsvk-VV57583',
-                warehouse='MCP_WH',
-                database='MCP_PLATFORM',
-                schema='FINANCE'
-            )
-            logger.info("✅ Connected to Snowflake")
-            return conn
-        except Exception as e:
-            logger.error(f"❌ Snowflake connection failed: {e}")
-            return None
+        # Same pooled connection manager (and credentials) as the API's data loader
+        self.snowflake_pool = SnowflakeConnectionPool.from_env()
 
     async def load_transport_data(self) -> pd.DataFrame:
         """Load TFL transport data"""
@@ -186,7 +175,7 @@ class SimplifiedDataLoader:
     async def load_financial_data_from_snowflake(self) -> pd.DataFrame:
         """Load financial data from Snowflake"""
         try:
-            if self.snowflake_conn:
+            if self.snowflake_pool.configured:
                 query = """
                 SELECT 
                     SYMBOL,
@@ -202,12 +191,7 @@ class SimplifiedDataLoader:
                 ORDER BY TIMESTAMP DESC, SYMBOL
                 """
                 
-                cursor = self.snowflake_conn.cursor()
-                cursor.execute(query)
-                rows = cursor.fetchall()
-                columns = [desc[0] for desc in cursor.description]
-                df = pd.DataFrame(rows, columns=columns)
-                cursor.close()
+                df = await asyncio.to_thread(self.snowflake_pool.run, lambda conn: self._fetch_dataframe(conn, query))
                     
                 logger.info(f"📊 Loaded {len(df)} financial records from Snowflake")
                 return df
@@ -219,6 +203,21 @@ class SimplifiedDataLoader:
             logger.error(f"Error loading financial data: {e}")
             return self._get_sample_financial_data()
 
+    def _fetch_dataframe(self, conn, query: str) -> pd.DataFrame:
+        """Run a query on a pooled connection (blocking)"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query)
+            try:
+                # Arrow-backed fetch builds typed columns without a Python object per cell
+                return cursor.fetch_pandas_all()
+            except (NotSupportedError, ProgrammingError):
+                rows = cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description]
+                return pd.DataFrame(rows, columns=columns)
+        finally:
+            cursor.close()
+
     def _get_sample_financial_data(self) -> pd.DataFrame:
         """Sample financial data"""
         symbols = ['HSBA.L', 'BP.L', 'GSK.L', 'ULVR.L', 'AZN.L', 'RIO.L', 'LLOY.L', 'BARC.L']
@@ -628,7 +627,8 @@ async def main():
     logger.info("🚀 Starting TFL Finance Weather MCP Server...")
     
     # Test connections
-    if data_loader.snowflake_conn:
+    await asyncio.to_thread(data_loader.snowflake_pool.warm_up)
+    if data_loader.snowflake_pool.get_stats()['open_connections']:
         logger.info("✅ Snowflake connection active")
     else:
         logger.warning("⚠️ Snowflake connection not available")
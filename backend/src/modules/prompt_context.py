@@ -0,0 +1,201 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token for English/JSON text. Deliberately low so the
+# estimate stays above what the tokenizer actually counts.
+CHARS_PER_TOKEN = 3.5
+
+# Columns (lower-cased) worth showing the model per sector, most important first.
+# Intent keywords found in the prompt pull in extra column groups.
+SECTOR_COLUMNS = {
+    'transportation': ['line_name', 'mode', 'status', 'delay_minutes', 'severity', 'reason'],
+    'finance': ['symbol', 'company_name', 'sector', 'open', 'close', 'high', 'low', 'volume', 'timestamp'],
+    'weather': ['timestamp', 'temperature', 'humidity', 'precipitation', 'weather_code', 'location'],
+    'energy': ['timestamp', 'price', 'demand', 'generation', 'carbon_intensity', 'fuel_type']
+}
+# Alternative spellings used by some sources (the sample market data)
+COLUMN_ALIASES = {
+    'open_price': 'open',
+    'close_price': 'close',
+    'high_price': 'high',
+    'low_price': 'low',
+    'status_severity': 'severity'
+}
+INTENT_COLUMNS = {
+    'transportation': {
+        ('crowd', 'busy', 'capacity', 'load'): ['crowding_level', 'passenger_capacity', 'current_load'],
+        ('route', 'station', 'destination', 'journey'): ['route_names', 'origin_stations', 'destination_stations'],
+        ('night', 'overnight'): ['is_night_service', 'night_service'],
+        ('disruption', 'why', 'cause', 'reason'): ['category', 'disruption_reasons']
+    }
+}
+# The column whose extremes are reported as anomalies, per sector
+PRIMARY_METRIC = {
+    'transportation': 'delay_minutes',
+    'weather': 'temperature',
+    'energy': 'price'
+}
+
+
+class PromptContextBuilder:
+    """Compact, token-budgeted description of a sector frame for LLM prompts
+
+    Instead of every row with every column, the context is built in priority
+    order: shape, per-column statistics, status/category distributions, the
+    top-k outlier rows, then as many remaining rows (relevant columns only) as
+    still fit. Each section is added only if it fits the budget, so the result
+    never exceeds `token_budget` estimated tokens regardless of the row count.
+    """
+
+    def __init__(self, token_budget: int = 1500, top_k: int = 5):
+        self.token_budget = token_budget
+        self.top_k = top_k
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return int(np.ceil(len(text) / CHARS_PER_TOKEN))
+
+    def build(self, data: Optional[pd.DataFrame], sector: str, prompt: str = '') -> str:
+        if data is None or data.empty:
+            return "No data available"
+
+        frame = self._relevant_frame(data, sector, prompt)
+        frame = self._finance_latest(frame) if sector == 'finance' else frame
+
+        sections = [f"Dataset: {len(data)} records; columns shown: {', '.join(frame.columns)}"]
+        sections.extend(self._statistics(frame))
+        sections.extend(self._distributions(frame))
+
+        outliers = self._outliers(frame, sector)
+        if not outliers.empty:
+            sections.append(f"Top {len(outliers)} notable records: {self._records_json(outliers)}")
+
+        context = self._fit(sections)
+        remaining = frame.drop(index=outliers.index, errors='ignore')
+        return self._append_rows(context, remaining)
+
+    def _relevant_frame(self, data: pd.DataFrame, sector: str, prompt: str) -> pd.DataFrame:
+        by_lower = {}
+        for col in data.columns:
+            name = str(col).lower()
+            by_lower.setdefault(COLUMN_ALIASES.get(name, name), col)
+        wanted = list(SECTOR_COLUMNS.get(sector, []))
+        prompt_lower = prompt.lower()
+        for keywords, columns in INTENT_COLUMNS.get(sector, {}).items():
+            if any(keyword in prompt_lower for keyword in keywords):
+                wanted.extend(columns)
+
+        names = [name for name in dict.fromkeys(wanted) if name in by_lower]
+        if not names:
+            # Unknown sector layout: keep simple scalar columns
+            names = [name for name, col in by_lower.items()
+                     if not data[col].map(lambda v: isinstance(v, (list, dict))).any()]
+        frame = data[[by_lower[name] for name in names]]
+        frame.columns = names
+        return frame
+
+    def _finance_latest(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Latest row per symbol with its intraday change (cf. AIAnalyzerModule._prepare_simplified_financial_data)"""
+        if 'symbol' not in frame:
+            return frame
+        if 'timestamp' in frame:
+            frame = frame.sort_values('timestamp')
+        latest = frame.groupby('symbol', sort=False).last().reset_index()
+        if {'open', 'close'} <= set(latest.columns):
+            open_price = pd.to_numeric(latest['open'], errors='coerce')
+            close_price = pd.to_numeric(latest['close'], errors='coerce')
+            latest['daily_change_pct'] = ((close_price - open_price) / open_price.replace(0, np.nan) * 100).round(2)
+        return latest
+
+    def _statistics(self, frame: pd.DataFrame) -> List[str]:
+        numeric = frame.select_dtypes(include=[np.number])
+        if numeric.empty:
+            return []
+        stats = numeric.agg(['min', 'mean', 'max']).round(2)
+        summary = {
+            col: {stat: self._scalar(value) for stat, value in stats[col].items()}
+            for col in stats.columns
+        }
+        return [f"Statistics (min/mean/max): {json.dumps(summary, default=str)}"]
+
+    def _distributions(self, frame: pd.DataFrame) -> List[str]:
+        sections = []
+        for col in ('status', 'mode', 'category', 'crowding_level', 'weather_code'):
+            if col in frame and frame[col].nunique() < len(frame):
+                counts = frame[col].astype(str).value_counts().head(8)
+                sections.append(f"{col} distribution: {json.dumps(counts.to_dict())}")
+        return sections
+
+    def _outliers(self, frame: pd.DataFrame, sector: str) -> pd.DataFrame:
+        metric = 'daily_change_pct' if sector == 'finance' else PRIMARY_METRIC.get(sector)
+        if metric not in frame:
+            return frame.iloc[0:0]
+        values = pd.to_numeric(frame[metric], errors='coerce')
+        if values.notna().sum() == 0:
+            return frame.iloc[0:0]
+        if sector == 'transportation':
+            # The most delayed lines
+            score = values
+        else:
+            # Furthest from the typical value
+            score = (values - values.median()).abs()
+        order = score[score > 0].sort_values(ascending=False)
+        return frame.loc[order.index[:self.top_k]]
+
+    def _fit(self, sections: List[str]) -> str:
+        context = ''
+        for section in sections:
+            candidate = f"{context}\n{section}" if context else section
+            if self.estimate_tokens(candidate) > self.token_budget:
+                logger.debug("Prompt context section dropped to stay within the token budget")
+                continue
+            context = candidate
+        return context
+
+    def _append_rows(self, context: str, rows: pd.DataFrame) -> str:
+        if rows.empty:
+            return context
+        header = "\nOther records: "
+        # Largest prefix of rows that still fits, found by bisection over the serialized size
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.estimate_tokens(context + header + self._records_json(rows.iloc[:middle]) + self._omitted(len(rows) - middle)) <= self.token_budget:
+                low = middle
+            else:
+                high = middle - 1
+        if low == 0:
+            omitted = self._omitted(len(rows))
+            return context + omitted if self.estimate_tokens(context + omitted) <= self.token_budget else context
+        return context + header + self._records_json(rows.iloc[:low]) + self._omitted(len(rows) - low)
+
+    def _records_json(self, rows: pd.DataFrame) -> str:
+        records = [
+            {col: self._scalar(value) for col, value in row.items() if not self._is_missing(value)}
+            for row in rows.to_dict('records')
+        ]
+        return json.dumps(records, default=str, separators=(',', ':'))
+
+    @staticmethod
+    def _omitted(count: int) -> str:
+        return f"\n({count} more records omitted)" if count else ''
+
+    @staticmethod
+    def _is_missing(value: Any) -> bool:
+        return value is None or (isinstance(value, float) and np.isnan(value))
+
+    @staticmethod
+    def _scalar(value: Any) -> Any:
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float):
+            return None if not np.isfinite(value) else round(value, 2)
+        if isinstance(value, pd.Timestamp):
+            return value.isoformat()
+        return value
@@ -0,0 +1,211 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta, time as dt_time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from modules.data_loader import DataLoaderModule
+from utils.helpers import fingerprint
+
+logger = logging.getLogger(__name__)
+
+Listener = Callable[[str, Any], Awaitable[None]]
+
+
+class RefreshJob:
+    """How and how often one source is refreshed
+
+    A job runs every `interval` seconds, or once a day at `daily_at` (local time in
+    `timezone`). After a failure it retries after `retry_interval`, doubling on
+    each consecutive failure up to `max_backoff`. Every delay is jittered by
+    +/- `jitter` so jobs never line up against the same upstream.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        refresh: Callable[[], Awaitable[Optional[Any]]],
+        interval: Optional[float] = None,
+        daily_at: Optional[dt_time] = None,
+        timezone: str = 'Europe/London',
+        retry_interval: float = 30,
+        max_backoff: float = 900,
+        jitter: float = 0.1
+    ):
+        if interval is None and daily_at is None:
+            raise ValueError(f"Refresh job {source} needs an interval or a daily time")
+        self.source = source
+        self.refresh = refresh
+        self.interval = interval
+        self.daily_at = daily_at
+        self.timezone = timezone
+        self.retry_interval = retry_interval
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+    def next_delay(self, failures: int) -> float:
+        """Seconds until the next run"""
+        if failures:
+            delay = min(self.retry_interval * 2 ** (failures - 1), self.max_backoff)
+        elif self.daily_at is not None:
+            delay = self._seconds_until_daily_run()
+        else:
+            delay = self.interval
+        return max(1.0, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def _seconds_until_daily_run(self) -> float:
+        try:
+            tz = ZoneInfo(self.timezone)
+        except ZoneInfoNotFoundError:
+            logger.warning(f"Unknown timezone {self.timezone}, scheduling {self.source} in UTC")
+            tz = ZoneInfo('UTC')
+        now = datetime.now(tz)
+        run_at = now.replace(hour=self.daily_at.hour, minute=self.daily_at.minute, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return (run_at - now).total_seconds()
+
+
+class DataRefreshScheduler:
+    """Background polling that keeps every source's cache entry warm
+
+    Each job refreshes its source into DataLoaderModule's cache on its own
+    cadence, so request handlers (dashboard, prompts, MCP tools) are served from
+    memory and never wait on TFL, Open-Meteo or Snowflake. When a refresh returns
+    different data than last time, the source's version is bumped and listeners
+    registered with subscribe() are called with the new snapshot.
+    """
+
+    def __init__(self, data_loader: DataLoaderModule, jobs: Optional[List[RefreshJob]] = None):
+        self.data_loader = data_loader
+        self.jobs = jobs if jobs is not None else self.default_jobs(data_loader)
+        self.snapshots: Dict[str, Any] = {}
+        self.versions: Dict[str, int] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._listeners: List[Listener] = []
+        self._tasks: List[asyncio.Task] = []
+
+    @staticmethod
+    def default_jobs(data_loader: DataLoaderModule) -> List[RefreshJob]:
+        """TFL every ~30s, weather every ~15min, Snowflake daily after the 18:00 UTC Airflow DAG"""
+        finance_hour, finance_minute = os.getenv('FINANCE_REFRESH_TIME', '18:30').split(':')
+        return [
+            RefreshJob(
+                'transport',
+                data_loader.refresh_transport_data,
+                interval=float(os.getenv('REFRESH_INTERVAL_TRANSPORT', '30')),
+                retry_interval=15,
+                max_backoff=300
+            ),
+            RefreshJob(
+                'weather',
+                data_loader.refresh_weather_data,
+                interval=float(os.getenv('REFRESH_INTERVAL_WEATHER', '900')),
+                retry_interval=60,
+                max_backoff=900
+            ),
+            RefreshJob(
+                'finance',
+                data_loader.refresh_financial_data,
+                daily_at=dt_time(int(finance_hour), int(finance_minute)),
+                # Same clock as the DAG's cron: Airflow schedules in UTC by default
+                timezone=os.getenv('FINANCE_REFRESH_TZ', 'UTC'),
+                retry_interval=300,
+                max_backoff=3600
+            )
+        ]
+
+    def subscribe(self, listener: Listener):
+        """Call `await listener(source, snapshot)` whenever a source's data changes"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def start(self):
+        """Start one polling task per job; each runs its first refresh immediately"""
+        if self._tasks:
+            return
+        for job in self.jobs:
+            self._status[job.source] = {
+                'last_run': None,
+                'last_success': None,
+                'last_change': None,
+                'failures': 0,
+                'next_run': None
+            }
+            self._tasks.append(asyncio.create_task(self._run_job(job), name=f"refresh-{job.source}"))
+        logger.info(f"✅ Data refresh scheduler started for {', '.join(job.source for job in self.jobs)}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Data refresh scheduler stopped")
+
+    async def run_now(self, source: str) -> bool:
+        """Refresh one source immediately, outside its cadence"""
+        for job in self.jobs:
+            if job.source == source:
+                return await self._run_once(job)
+        raise ValueError(f"No refresh job for {source}")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            source: {**status, 'version': self.versions.get(source, 0)}
+            for source, status in self._status.items()
+        }
+
+    async def _run_job(self, job: RefreshJob):
+        status = self._status[job.source]
+        while True:
+            await self._run_once(job)
+            delay = job.next_delay(status['failures'])
+            status['next_run'] = (datetime.utcnow() + timedelta(seconds=delay)).isoformat()
+            await asyncio.sleep(delay)
+
+    async def _run_once(self, job: RefreshJob) -> bool:
+        status = self._status.setdefault(job.source, {'failures': 0})
+        status['last_run'] = datetime.utcnow().isoformat()
+        started = time.monotonic()
+        try:
+            snapshot = await job.refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled refresh of {job.source} failed: {e}")
+            snapshot = None
+
+        if snapshot is None:
+            status['failures'] = status.get('failures', 0) + 1
+            logger.warning(f"Scheduled refresh of {job.source} returned no data ({status['failures']} in a row)")
+            return False
+
+        status['failures'] = 0
+        status['last_success'] = datetime.utcnow().isoformat()
+        status['duration_ms'] = round((time.monotonic() - started) * 1000)
+        await self._publish(job.source, snapshot)
+        return True
+
+    async def _publish(self, source: str, snapshot: Any):
+        # Columns such as the fetch timestamp change every time without the data changing
+        content_hash = fingerprint(snapshot)
+        if content_hash == self._fingerprints.get(source):
+            return
+
+        self._fingerprints[source] = content_hash
+        self.snapshots[source] = snapshot
+        self.versions[source] = self.versions.get(source, 0) + 1
+        self._status[source]['last_change'] = datetime.utcnow().isoformat()
+
+        for listener in list(self._listeners):
+            try:
+                await listener(source, snapshot)
+            except Exception as e:
+                logger.error(f"Refresh listener failed for {source}: {e}")
@@ -0,0 +1,282 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import snowflake.connector
+from snowflake.connector.errors import DatabaseError, ProgrammingError
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Snowflake error numbers meaning the session or its auth token is gone and a
+# fresh login is required
+SESSION_EXPIRED_ERRNOS = {390111, 390112, 390114}
+
+
+class SnowflakeConnectionPool:
+    """Thread-safe pool of Snowflake connections
+
+    Logging in costs 1-2s, so connections are kept open and reused. Idle connections
+    are closed after idle_timeout (reaped from the cold end of the idle stack on
+    every checkout and return, since reuse is most-recent-first), connections idle longer than ping_interval are
+    checked with a cheap query before reuse, and work that fails because the session
+    expired is retried once on a freshly logged-in connection. All methods block and
+    are meant to run on a worker thread (see DataLoaderModule._run_snowflake).
+    """
+
+    def __init__(
+        self,
+        connect_kwargs: Dict[str, Any],
+        min_size: int = 1,
+        max_size: int = 4,
+        idle_timeout: float = 900,
+        ping_interval: float = 60,
+        acquire_timeout: float = 30,
+        connect_retry_interval: float = 30
+    ):
+        self.connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self.acquire_timeout = acquire_timeout
+        self.connect_retry_interval = connect_retry_interval
+
+        self._idle = deque()  # (connection, last_used) pairs, most recent on the right
+        self._size = 0
+        self._closed = False
+        self._last_connect_failure: Optional[float] = None
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_env(cls) -> 'SnowflakeConnectionPool':
+        """Build a pool from the same environment variables the data loader always used"""
+        connect_kwargs = {
+            'user': os.getenv("user"),
+            'password': os.getenv("password"),
+            'account': os.getenv("account"),
+            'warehouse': os.getenv("warehouse"),
+            'database': os.getenv("database"),
+            'schema': os.getenv("schema"),
+            'client_session_keep_alive': True
+        }
+        return cls(
+            connect_kwargs,
+            min_size=int(os.getenv('SNOWFLAKE_POOL_MIN_SIZE', '1')),
+            max_size=int(os.getenv('SNOWFLAKE_POOL_MAX_SIZE', '4')),
+            idle_timeout=float(os.getenv('SNOWFLAKE_POOL_IDLE_TIMEOUT', '900'))
+        )
+
+    @property
+    def configured(self) -> bool:
+        """Whether credentials are available at all"""
+        return all(self.connect_kwargs.get(key) for key in ('user', 'password', 'account'))
+
+    def warm_up(self):
+        """Open min_size connections ahead of the first request"""
+        if not self.configured:
+            logger.warning("⚠️ Missing Snowflake credentials in environment variables.")
+            return
+
+        connections = []
+        try:
+            for _ in range(self.min_size):
+                connections.append(self._acquire())
+            logger.info(f"✅ Snowflake pool warmed up with {len(connections)} connection(s).")
+        except Exception as e:
+            logger.error(f"Failed to connect to Snowflake: {e}")
+        finally:
+            for conn in connections:
+                self._release(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a live connection; it is discarded instead of returned if it breaks"""
+        conn = self._acquire()
+        healthy = True
+        try:
+            yield conn
+        except Exception as e:
+            healthy = not (self._is_session_expired(e) or self._is_closed(conn))
+            raise
+        finally:
+            if healthy:
+                self._release(conn)
+            else:
+                self._discard(conn)
+
+    def run(self, func: Callable[[Any], Any]) -> Any:
+        """Call func(connection), logging in again once if the session has expired"""
+        try:
+            with self.connection() as conn:
+                return func(conn)
+        except (ProgrammingError, DatabaseError) as e:
+            if not self._is_session_expired(e):
+                raise
+            logger.warning(f"Snowflake session expired ({e.errno}), reconnecting")
+            with self.connection() as conn:
+                return func(conn)
+
+    def close(self):
+        """Close every idle connection and refuse new checkouts"""
+        with self._condition:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+
+        for conn, _ in idle:
+            self._close_quietly(conn)
+        logger.info("Snowflake connection pool closed")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'configured': self.configured,
+                'open_connections': self._size,
+                'idle_connections': len(self._idle),
+                'max_size': self.max_size
+            }
+
+    def _acquire(self):
+        self._reap_idle()
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError("Snowflake connection pool is closed")
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                elif self._size < self.max_size:
+                    # Reserve the slot, then log in outside the lock
+                    self._size += 1
+                    conn, last_used = None, None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a Snowflake connection")
+                    self._condition.wait(remaining)
+                    continue
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.idle_timeout or (idle_for > self.ping_interval and not self._ping(conn)):
+                self._discard(conn)
+                continue
+            return conn
+
+    def _release(self, conn):
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+                close_now = True
+            else:
+                self._idle.append((conn, time.monotonic()))
+                close_now = False
+            self._condition.notify()
+
+        if close_now:
+            self._close_quietly(conn)
+        else:
+            self._reap_idle()
+
+    def _reap_idle(self):
+        """Close connections idle longer than idle_timeout
+
+        Reuse pops the most recently returned connection, so after a burst the
+        older ones at the left end would otherwise sit open (and kept alive by
+        client_session_keep_alive) indefinitely.
+        """
+        expired = []
+        with self._condition:
+            now = time.monotonic()
+            while len(self._idle) > 0 and now - self._idle[0][1] > self.idle_timeout:
+                conn, _ = self._idle.popleft()
+                expired.append(conn)
+            self._size -= len(expired)
+            if expired:
+                self._condition.notify(len(expired))
+
+        for conn in expired:
+            self._close_quietly(conn)
+        if expired:
+            logger.info(f"Closed {len(expired)} idle Snowflake connection(s)")
+
+    def _discard(self, conn):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        self._close_quietly(conn)
+
+    def _connect(self):
+        if not self.configured:
+            raise RuntimeError("Snowflake credentials are not configured")
+
+        # Fail fast while Snowflake is unreachable instead of paying a login timeout per request.
+        # Checked and claimed under the lock, so once the interval is up only one caller
+        # probes Snowflake; the rest keep failing fast until that attempt settles.
+        with self._condition:
+            if self._last_connect_failure is not None:
+                now = time.monotonic()
+                since_failure = now - self._last_connect_failure
+                if since_failure < self.connect_retry_interval:
+                    raise ConnectionError(
+                        f"Snowflake unavailable, retrying in {self.connect_retry_interval - since_failure:.0f}s"
+                    )
+                self._last_connect_failure = now
+
+        try:
+            conn = snowflake.connector.connect(**self.connect_kwargs)
+        except Exception:
+            with self._condition:
+                self._last_connect_failure = time.monotonic()
+            raise
+        with self._condition:
+            self._last_connect_failure = None
+        logger.info("✅ Successfully connected to Snowflake.")
+        return conn
+
+    def _ping(self, conn) -> bool:
+        if self._is_closed(conn):
+            return False
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Snowflake liveness check failed: {e}")
+            return False
+
+    def _is_closed(self, conn) -> bool:
+        try:
+            return conn.is_closed()
+        except Exception:
+            return True
+
+    def _is_session_expired(self, error: Exception) -> bool:
+        return getattr(error, 'errno', None) in SESSION_EXPIRED_ERRNOS
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Error closing Snowflake connection: {e}")
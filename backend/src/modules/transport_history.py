@@ -0,0 +1,191 @@
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS line_status (
+        ts INTEGER NOT NULL,
+        line_id TEXT NOT NULL,
+        line_name TEXT,
+        mode TEXT,
+        status TEXT,
+        severity INTEGER,
+        delay_minutes REAL,
+        is_delayed INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_line_status_line_ts ON line_status (line_id, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_line_status_ts ON line_status (ts)"
+]
+
+
+class TransportHistoryStore:
+    """Append-only SQLite time series of TFL line status snapshots
+
+    Every fresh TFL fetch is written as one batched insert, on a single writer
+    thread so the event loop never waits on disk. Rows older than the retention
+    period are pruned at most once an hour. Reads are range scans on the
+    (line_id, ts) and ts indexes.
+    """
+
+    def __init__(self, path: str, retention_days: float = 30, prune_interval: float = 3600):
+        self.path = path
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._disabled = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='transport-history')
+
+    @classmethod
+    def from_env(cls) -> 'TransportHistoryStore':
+        return cls(
+            os.getenv('TRANSPORT_HISTORY_PATH', os.path.expanduser('~/.smartmcp/transport_history.db')),
+            retention_days=float(os.getenv('TRANSPORT_HISTORY_RETENTION_DAYS', '30'))
+        )
+
+    async def record(self, snapshot: pd.DataFrame):
+        """Queue a processed TFL snapshot for appending; returns once it is written"""
+        if snapshot is None or snapshot.empty or self._disabled:
+            return
+        rows = self._to_rows(snapshot)
+        await self._run(self._append, rows)
+
+    async def get_line_history(self, hours: float = 72, line_ids: Optional[List[str]] = None) -> pd.DataFrame:
+        """Per-line status samples from the last `hours`, oldest first"""
+        return await self._run(self._query_lines, time.time() - hours * 3600, line_ids)
+
+    async def get_delay_series(self, hours: float = 6, bucket_minutes: int = 60) -> pd.DataFrame:
+        """Network-wide delay per time bucket: mean and max delay of delayed lines, and their count"""
+        return await self._run(self._query_delay_series, time.time() - hours * 3600, bucket_minutes * 60)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and not self._disabled:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                conn.commit()
+                self._conn = conn
+                logger.info(f"✅ Transport history store opened at {self.path}")
+            except Exception as e:
+                # History is an enhancement; never let it break transport loads
+                logger.error(f"Transport history disabled, cannot open {self.path}: {e}")
+                self._disabled = True
+        return self._conn
+
+    def _to_rows(self, snapshot: pd.DataFrame) -> list:
+        def column(name, default):
+            if name in snapshot:
+                return snapshot[name]
+            return pd.Series(default, index=snapshot.index)
+
+        status = column('status', 'Unknown').astype(str)
+        delay = pd.to_numeric(column('delay_minutes', 0), errors='coerce').fillna(0).astype(float)
+        # Sample data names the column status_severity
+        severity = column('severity', None)
+        if severity.isna().all():
+            severity = column('status_severity', 10)
+        severity = pd.to_numeric(severity, errors='coerce').fillna(10).astype(int)
+        is_delayed = delay > 0
+
+        return list(zip(
+            [int(time.time())] * len(snapshot),
+            column('line_id', 'unknown').astype(str),
+            column('line_name', 'Unknown Line').astype(str),
+            column('mode', 'unknown').astype(str),
+            status,
+            severity.tolist(),
+            delay.tolist(),
+            is_delayed.astype(int).tolist()
+        ))
+
+    def _append(self, rows: list):
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            with conn:
+                conn.executemany(
+                    "INSERT INTO line_status (ts, line_id, line_name, mode, status, severity, delay_minutes, is_delayed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+            if time.monotonic() - self._last_prune > self.prune_interval:
+                self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection):
+        cutoff = int(time.time() - self.retention_days * 86400)
+        with conn:
+            deleted = conn.execute("DELETE FROM line_status WHERE ts < ?", (cutoff,)).rowcount
+        self._last_prune = time.monotonic()
+        if deleted:
+            logger.info(f"Pruned {deleted} transport history rows older than {self.retention_days} days")
+
+    def _query_lines(self, since: float, line_ids: Optional[List[str]]) -> pd.DataFrame:
+        query = (
+            "SELECT ts, line_id, line_name, mode, status, severity, delay_minutes "
+            "FROM line_status WHERE ts >= ?"
+        )
+        params = [int(since)]
+        if line_ids:
+            query += f" AND line_id IN ({', '.join('?' for _ in line_ids)})"
+            params.extend(line_ids)
+        query += " ORDER BY ts"
+
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return pd.DataFrame()
+            history = pd.read_sql_query(query, conn, params=params)
+
+        history.insert(0, 'timestamp', pd.to_datetime(history.pop('ts'), unit='s'))
+        return history
+
+    def _query_delay_series(self, since: float, bucket_seconds: int) -> pd.DataFrame:
+        query = """
+            SELECT (ts / ?) * ? AS bucket,
+                   COALESCE(AVG(CASE WHEN is_delayed = 1 THEN delay_minutes END), 0) AS value,
+                   COUNT(DISTINCT CASE WHEN is_delayed = 1 THEN line_id END) AS delayed_services,
+                   COALESCE(MAX(CASE WHEN is_delayed = 1 THEN delay_minutes END), 0) AS max_delay
+            FROM line_status
+            WHERE ts >= ?
+            GROUP BY bucket
+            ORDER BY bucket
+        """
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return pd.DataFrame()
+            series = pd.read_sql_query(query, conn, params=[bucket_seconds, bucket_seconds, int(since)])
+
+        series.insert(0, 'timestamp', pd.to_datetime(series.pop('bucket'), unit='s'))
+        return series
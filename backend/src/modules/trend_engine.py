@@ -0,0 +1,264 @@
+import logging
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_COLUMNS = [
+    'close_sum', 'close_sumsq', 'count', 'first_close', 'first_ts',
+    'last_close', 'last_ts', 'volume', 'company'
+]
+
+
+class IncrementalTrendEngine:
+    """Market trend analytics maintained incrementally from raw price rows
+
+    Raw rows are reduced to one aggregate per (DATE, SYMBOL): close sum, sum of
+    squares and count, first/last close with their timestamps, and volume. Only
+    rows newer than the watermark (the latest TIMESTAMP folded so far) are added,
+    so keeping the analysis current costs O(new rows) instead of re-reading the
+    whole history, and every statistic in the payload is derived from the
+    aggregates rather than the raw rows.
+    """
+
+    def __init__(self, history_days: Optional[int] = None):
+        self.history_days = history_days
+        self.watermark: Optional[pd.Timestamp] = None
+        self._daily = pd.DataFrame(
+            columns=AGGREGATE_COLUMNS,
+            index=pd.MultiIndex.from_tuples([], names=['DATE', 'SYMBOL'])
+        )
+
+    @property
+    def empty(self) -> bool:
+        return self._daily.empty
+
+    def aggregate(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Reduce raw rows newer than the watermark to per-day/per-symbol aggregates
+
+        Safe to call from a worker thread while rows are still streaming in; the
+        engine itself only changes in merge().
+        """
+        if rows is None or rows.empty:
+            return self._daily.iloc[0:0]
+
+        rows = rows[['SYMBOL', 'COMPANY_NAME', 'CLOSE', 'VOLUME', 'TIMESTAMP']].copy()
+        rows['TIMESTAMP'] = pd.to_datetime(rows['TIMESTAMP'])
+        if self.watermark is not None:
+            rows = rows[rows['TIMESTAMP'] > self.watermark]
+            if rows.empty:
+                return self._daily.iloc[0:0]
+
+        rows['DATE'] = rows['TIMESTAMP'].dt.date
+        rows['CLOSE'] = rows['CLOSE'].astype(float)
+        rows['CLOSE_SQ'] = rows['CLOSE'] ** 2
+        rows = rows.sort_values('TIMESTAMP', kind='stable')
+
+        return rows.groupby(['DATE', 'SYMBOL'], sort=False).agg(
+            close_sum=('CLOSE', 'sum'),
+            close_sumsq=('CLOSE_SQ', 'sum'),
+            count=('CLOSE', 'count'),
+            first_close=('CLOSE', 'first'),
+            first_ts=('TIMESTAMP', 'first'),
+            last_close=('CLOSE', 'last'),
+            last_ts=('TIMESTAMP', 'last'),
+            volume=('VOLUME', 'sum'),
+            company=('COMPANY_NAME', 'first')
+        )
+
+    def merge(self, aggregates: List[pd.DataFrame]) -> int:
+        """Combine aggregates from aggregate() into the engine and advance the watermark
+
+        Returns the number of raw rows that were added.
+        """
+        aggregates = [agg for agg in aggregates if not agg.empty]
+        if not aggregates:
+            return 0
+
+        combined = pd.concat([self._daily, *aggregates]) if not self._daily.empty else pd.concat(aggregates)
+        combined = combined.reset_index()
+
+        by_first = combined.sort_values('first_ts', kind='stable').groupby(['DATE', 'SYMBOL'])
+        merged = by_first.agg(
+            close_sum=('close_sum', 'sum'),
+            close_sumsq=('close_sumsq', 'sum'),
+            count=('count', 'sum'),
+            first_close=('first_close', 'first'),
+            first_ts=('first_ts', 'first'),
+            volume=('volume', 'sum'),
+            company=('company', 'first')
+        )
+        by_last = combined.sort_values('last_ts', kind='stable').groupby(['DATE', 'SYMBOL'])
+        merged[['last_close', 'last_ts']] = by_last[['last_close', 'last_ts']].last()
+
+        added = int(sum(agg['count'].sum() for agg in aggregates))
+        self._daily = merged[AGGREGATE_COLUMNS]
+        self.watermark = self._daily['last_ts'].max()
+        self._prune()
+        return added
+
+    def fold(self, rows: pd.DataFrame) -> int:
+        """Aggregate and merge a frame of raw rows in one step"""
+        return self.merge([self.aggregate(rows)])
+
+    def daily_symbol_frame(self) -> pd.DataFrame:
+        """One row per (DATE, SYMBOL) with the day's mean close, for sector analytics"""
+        daily = self._daily.reset_index()
+        return pd.DataFrame({
+            'DATE': daily['DATE'],
+            'SYMBOL': daily['SYMBOL'],
+            'COMPANY_NAME': daily['company'],
+            'CLOSE': daily['close_sum'] / daily['count'],
+            'VOLUME': daily['volume'],
+            'TIMESTAMP': daily['last_ts']
+        })
+
+    def daily_market_close(self) -> pd.Series:
+        """Mean close over every row of each day, for the whole retained history"""
+        totals = self._daily.groupby(level='DATE')[['close_sum', 'count']].sum().sort_index()
+        return totals['close_sum'] / totals['count']
+
+    def compute(self) -> Optional[Dict[str, Any]]:
+        """Build the market, performance and per-stock sections of the trend payload
+
+        Returns None when there is too little history for a meaningful analysis.
+        """
+        if self._daily.empty:
+            return None
+
+        daily = self._daily
+        dates = daily.index.get_level_values('DATE')
+
+        logger.debug(
+            f"Trend analysis input: {int(daily['count'].sum())} records, {dates.min()} to {dates.max()}, "
+            f"{dates.nunique()} trading days, {daily.index.get_level_values('SYMBOL').nunique()} symbols"
+        )
+
+        # Use available days instead of fixed 30-day window
+        available_days = dates.nunique()
+        analysis_period = min(available_days, 30)  # Use available data, max 30 days
+
+        if available_days < 5:
+            logger.debug(f"Insufficient data ({available_days} days) for meaningful trend analysis")
+            return None
+
+        # Market-level trends: the mean close over every row of the day
+        daily_market = daily.groupby(level='DATE')[['count', 'volume']].sum().sort_index()
+        daily_market['CLOSE'] = self.daily_market_close()
+        daily_market['price_change'] = daily_market['CLOSE'].pct_change() * 100
+        daily_market['volume_change'] = daily_market['volume'].pct_change() * 100
+
+        recent_period = daily_market.tail(analysis_period)
+
+        market_trends = []
+        for date, row in recent_period.iterrows():
+            market_trends.append({
+                'date': date.isoformat(),
+                'price': round(float(row['CLOSE']), 2),
+                'volume': int(row['volume']),
+                'price_change': round(float(row['price_change']), 2) if not pd.isna(row['price_change']) else 0,
+                'stocks_traded': int(row['count'])
+            })
+
+        if len(recent_period) >= 2:
+            start_price = recent_period['CLOSE'].iloc[0]
+            end_price = recent_period['CLOSE'].iloc[-1]
+            total_return = ((end_price - start_price) / start_price) * 100 if start_price > 0 else 0
+            avg_daily_return = recent_period['price_change'].mean()
+            volatility = recent_period['price_change'].std()
+        else:
+            total_return = avg_daily_return = volatility = 0
+
+        # Sorted best to worst performer
+        stock_trends = self._stock_trends(recent_period.index)
+        if not stock_trends:
+            return None
+
+        period_name = f"{analysis_period}-Day"
+
+        trend_status = "Bullish" if total_return > 2 else "Neutral" if total_return > -2 else "Bearish"
+        volatility_status = "High" if volatility > 3 else "Moderate" if volatility > 1.5 else "Low"
+        momentum_status = "Positive" if avg_daily_return > 0.1 else "Neutral" if avg_daily_return > -0.1 else "Negative"
+
+        logger.debug(
+            f"Trend metrics ({period_name} period): return {total_return:+.2f}%, "
+            f"avg daily return {avg_daily_return:+.2f}%, volatility {volatility:.2f}%"
+        )
+
+        return {
+            'market_trends': market_trends,
+            'performance_metrics': [
+                {'name': f'{period_name} Return', 'value': f'{total_return:+.2f}%'},
+                {'name': 'Avg Daily Return', 'value': f'{avg_daily_return:+.2f}%'},
+                {'name': 'Volatility', 'value': f'{volatility:.2f}%'},
+                {'name': 'Best Performer', 'value': f'{stock_trends[0]["symbol"]} ({stock_trends[0]["period_change"]:+.2f}%)'},
+                {'name': 'Worst Performer', 'value': f'{stock_trends[-1]["symbol"]} ({stock_trends[-1]["period_change"]:+.2f}%)'}
+            ],
+            'trend_indicators': [
+                {'name': 'Market Trend', 'status': trend_status},
+                {'name': 'Volatility Level', 'status': volatility_status},
+                {'name': 'Momentum', 'status': momentum_status}
+            ],
+            'stock_performance': [
+                {
+                    'symbol': stock['symbol'],
+                    'company': stock['company'],
+                    'change': stock['period_change'],
+                    'volatility': stock['volatility']
+                } for stock in stock_trends
+            ],
+            'analysis_period': period_name,
+            'data_coverage': f"{available_days} days",
+            'volatility_data': [
+                {
+                    'date': day['date'],
+                    'volatility': abs(day['price_change'])
+                } for day in market_trends
+            ]
+        }
+
+    def _stock_trends(self, window_dates: pd.Index) -> List[Dict[str, Any]]:
+        """Period change and volatility per symbol over the analysis window, in one groupby"""
+        daily = self._daily
+        in_window = daily[daily.index.get_level_values('DATE').isin(window_dates)].sort_index()
+        if in_window.empty:
+            return []
+
+        stats = in_window.groupby(level='SYMBOL').agg(
+            count=('count', 'sum'),
+            close_sum=('close_sum', 'sum'),
+            close_sumsq=('close_sumsq', 'sum'),
+            start_price=('first_close', 'first'),
+            end_price=('last_close', 'last')
+        )
+        stats = stats[stats['count'] >= 2]
+        if stats.empty:
+            return []
+
+        stats['company'] = daily.groupby(level='SYMBOL')['company'].first().reindex(stats.index)
+        stats['period_change'] = np.where(
+            stats['start_price'] > 0,
+            (stats['end_price'] - stats['start_price']) / stats['start_price'] * 100,
+            0
+        )
+        # Sample std and mean of every close in the window, from the running sums
+        mean = stats['close_sum'] / stats['count']
+        variance = (stats['close_sumsq'] - stats['close_sum'] * mean).clip(lower=0) / (stats['count'] - 1)
+        stats['volatility'] = np.where(mean > 0, np.sqrt(variance) / mean * 100, 0)
+
+        stats = stats[['company', 'period_change', 'start_price', 'end_price', 'volatility']]
+        stats[['period_change', 'start_price', 'end_price', 'volatility']] = (
+            stats[['period_change', 'start_price', 'end_price', 'volatility']].astype(float).round(2)
+        )
+        stats = stats.sort_values('period_change', ascending=False, kind='stable')
+        return stats.rename_axis('symbol').reset_index().to_dict('records')
+
+    def _prune(self):
+        if not self.history_days or self._daily.empty:
+            return
+        dates = self._daily.index.get_level_values('DATE')
+        cutoff = dates.max() - timedelta(days=self.history_days)
+        self._daily = self._daily[dates >= cutoff]
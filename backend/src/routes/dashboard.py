@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
+from sse_starlette.sse import EventSourceResponse
 import logging
+import json
 from services.dashboard_service import DashboardService
+from utils.http_cache import conditional_json_response
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
@@ -16,20 +19,79 @@ def get_dashboard_service() -> DashboardService:
 
 @router.get("/", response_model=Dict[str, Any])
 async def get_dashboard_overview(
+    request: Request,
     dashboard_service: DashboardService = Depends(get_dashboard_service)
 ):
-    """Get comprehensive dashboard overview"""
+    """Get comprehensive dashboard overview
+
+    Tagged with the snapshot's content hash, so polls of an unchanged overview get a 304.
+    """
     try:
-        overview = await dashboard_service.get_overview()
-        return {
+        snapshot = await dashboard_service.get_snapshot()
+        payload = {
             "status": "success",
             "timestamp": datetime.utcnow().isoformat(),
-            "data": overview
+            "data": snapshot['overview']
         }
+        return conditional_json_response(
+            request,
+            payload,
+            max_age=dashboard_service.snapshot_max_age,
+            stale_while_revalidate=dashboard_service.snapshot_max_age,
+            content_hash=snapshot['content_hash']
+        )
     except Exception as e:
         logger.error(f"Error fetching dashboard overview: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch dashboard data")
 
+@router.get("/stream")
+async def stream_dashboard(
+    request: Request,
+    dashboard_service: DashboardService = Depends(get_dashboard_service)
+):
+    """Live dashboard updates as Server-Sent Events
+
+    Sends the full overview once as a `snapshot` event, then a `patch` event with
+    RFC 6902 operations each time a background refresh changes the overview. A
+    client that falls behind is sent a fresh `snapshot` instead.
+    """
+    # Subscribe before reading the snapshot so no change can slip in between
+    changes = dashboard_service.subscribe_changes()
+    
+    def snapshot_event(snapshot: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            "event": "snapshot",
+            "id": str(snapshot['version']),
+            "data": json.dumps({"version": snapshot['version'], "data": snapshot['overview']}, default=str)
+        }
+    
+    async def events():
+        try:
+            snapshot = await dashboard_service.get_snapshot()
+            version = snapshot['version']
+            yield snapshot_event(snapshot)
+            
+            while True:
+                change = await changes.get()
+                if change is not None and change['version'] <= version:
+                    continue
+                if change is None or change['base_version'] != version:
+                    snapshot = await dashboard_service.get_snapshot()
+                    version = snapshot['version']
+                    yield snapshot_event(snapshot)
+                    continue
+                
+                version = change['version']
+                yield {
+                    "event": "patch",
+                    "id": str(version),
+                    "data": json.dumps(change, default=str)
+                }
+        finally:
+            dashboard_service.unsubscribe_changes(changes)
+    
+    return EventSourceResponse(events(), ping=15)
+
 @router.get("/sector/{sector}", response_model=Dict[str, Any])
 async def get_sector_dashboard(
     sector: str,
@@ -43,7 +105,8 @@ async def get_sector_dashboard(
         if sector not in valid_sectors:
             raise HTTPException(status_code=400, detail=f"Invalid sector. Must be one of: {valid_sectors}")
         
-        sector_data = await dashboard_service.get_sector_dashboard(sector, timeframe)
+        # Served from the shared overview snapshot; timeframe is echoed back only
+        sector_data = await dashboard_service.get_sector_overview(sector)
         
         return {
             "status": "success",
@@ -52,6 +115,8 @@ async def get_sector_dashboard(
             "timestamp": datetime.utcnow().isoformat(),
             "data": sector_data
         }
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -96,20 +161,8 @@ async def get_active_alerts(
 ):
     """Get active alerts across all sectors"""
     try:
-        # This would aggregate alerts from all sectors
-        overview = await dashboard_service.get_overview()
-        alerts = []
-        if overview and isinstance(overview, dict):
-            for sector, data in overview.items():
-                if sector not in ['last_updated', 'summary'] and isinstance(data, dict):
-                    sector_alerts = data.get('alerts', [])
-                    for alert in sector_alerts:
-                        if isinstance(alert, dict):
-                            alert['sector'] = sector
-                            alerts.append(alert)
-        # Sort by severity
-        severity_order = {'critical': 0, 'high': 1, 'warning': 2, 'info': 3}
-        alerts.sort(key=lambda x: severity_order.get(x.get('severity', 'info'), 3))
+        # Collected from all sectors and sorted by severity when the snapshot was built
+        alerts = await dashboard_service.get_alerts()
         
         return {
             "status": "success",
@@ -127,18 +180,7 @@ async def get_key_metrics(
 ):
     """Get key business metrics across all sectors"""
     try:
-        overview = await dashboard_service.get_overview()
-        
-        metrics = {
-            "transportation": {
-                "delay_percentage": overview.get('transportation', {}).get('delay_percentage', 0) if overview else 0,
-                "major_issues": len(overview.get('transportation', {}).get('major_issues', [])) if overview else 0
-            },
-            "finance": {
-                "ftse_change": overview.get('finance', {}).get('ftse_change', 0) if overview else 0,
-                "market_trend": overview.get('finance', {}).get('trend', 'stable') if overview else 'stable'
-            }
-        }
+        metrics = await dashboard_service.get_metrics()
         
         return {
             "status": "success",
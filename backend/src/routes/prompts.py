@@ -1,8 +1,12 @@
 
 
-from fastapi import APIRouter, HTTPException, Query, Depends, Body
-from typing import Dict, List, Any, Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Body, Request
+from fastapi.responses import StreamingResponse
+from typing import Awaitable, Dict, List, Any, Optional
 from pydantic import BaseModel
+import asyncio
+import json
+from contextlib import aclosing
 import logging
 from services.prompt_service import PromptService
 
@@ -14,6 +18,22 @@ def get_prompt_service() -> PromptService:
     from main import app  # Import locally to avoid circular import
     return app.state.prompt_service
 
+async def _cancel_on_disconnect(http_request: Request, work: Awaitable, poll_interval: float = 0.5):
+    """Await work, cancelling it (and any LLM call inside) if the client goes away"""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info("Client disconnected, cancelling prompt analysis")
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
 class PromptRequest(BaseModel):
     prompt: str
     sector: Optional[str] = None
@@ -23,6 +43,7 @@ class PromptRequest(BaseModel):
 @router.post("/analyze", response_model=Dict[str, Any])
 async def analyze_prompt(
     request: PromptRequest,
+    http_request: Request,
     prompt_service: PromptService = Depends(get_prompt_service)
 ):
     """Analyze user prompt and generate insights"""
@@ -36,7 +57,10 @@ async def analyze_prompt(
             raise HTTPException(status_code=400, detail="Prompt too long. Maximum 1000 characters.")
         
         # Analyze the prompt
-        analysis = await prompt_service.analyze_prompt(request.prompt, request.sector)
+        analysis = await _cancel_on_disconnect(
+            http_request,
+            prompt_service.analyze_prompt(request.prompt, request.sector)
+        )
 
         print('analysing prompt')
         
@@ -67,6 +91,42 @@ async def analyze_prompt(
         logger.error(f"Error analyzing prompt: {e}")
         raise HTTPException(status_code=500, detail="Failed to analyze prompt")
 
+@router.post("/analyze/stream")
+async def analyze_prompt_stream(
+    request: PromptRequest,
+    prompt_service: PromptService = Depends(get_prompt_service)
+):
+    """Analyze a prompt, streaming the answer as newline-delimited JSON events
+
+    Events, in order: summary, insight (repeated, one per text delta),
+    recommendations, done; or a single result for multi-sector prompts. If the
+    model fails mid-answer an error event flagged 'partial' (or not, when basic
+    analysis replaced it) comes before recommendations; any other failure ends
+    the stream with an error event. If the client disconnects the stream is
+    cancelled, which stops the model's generation.
+    """
+    if not request.prompt.strip():
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty")
+    
+    if len(request.prompt) > 1000:
+        raise HTTPException(status_code=400, detail="Prompt too long. Maximum 1000 characters.")
+    
+    async def events():
+        try:
+            async with aclosing(prompt_service.stream_prompt(request.prompt, request.sector)) as stream:
+                async for event in stream:
+                    yield json.dumps(event, default=str) + "\n"
+        except Exception as e:
+            logger.error(f"Error streaming prompt analysis: {e}")
+            yield json.dumps({"type": "error", "detail": "Failed to analyze prompt"}) + "\n"
+    
+    # Content-Encoding identity keeps GZipMiddleware from buffering the stream
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Content-Encoding": "identity", "Cache-Control": "no-store"}
+    )
+
 @router.get("/suggestions", response_model=Dict[str, Any])
 async def get_prompt_suggestions(
     sector: Optional[str] = Query(None, description="Filter by sector"),
@@ -7,6 +7,9 @@ from modules.ai_analyzer import AIAnalyzerModule
 from modules.visualization import VisualizationModule
 import logging
 import asyncio
+import os
+import time
+from utils.helpers import fingerprint, json_patch
 
 logger = logging.getLogger(__name__)
 
@@ -16,9 +19,155 @@ class DashboardService:
         self.ai_analyzer = ai_analyzer
         self.visualization = visualization
         self.cache = {}  # Simple in-memory cache, replace with Redis in production
+        # The overview snapshot is rebuilt when the refresh scheduler reports a data
+        # change, or at the latest after this many seconds
+        self.snapshot_max_age = float(os.getenv('DASHBOARD_SNAPSHOT_MAX_AGE', '30'))
+        self._snapshot_lock = asyncio.Lock()
+        self._snapshot_built_at = 0.0
+        self._snapshot_stale = True
+        # One queue per live stream client, fed a JSON patch on every new snapshot version
+        self._change_queues: List[asyncio.Queue] = []
     
     async def get_overview(self) -> Dict[str, Any]:
         """Get comprehensive dashboard overview for all sectors"""
+        snapshot = await self.get_snapshot()
+        return snapshot['overview']
+    
+    async def get_alerts(self) -> List[Dict[str, Any]]:
+        """Active alerts across all sectors, most severe first"""
+        snapshot = await self.get_snapshot()
+        return snapshot['alerts']
+    
+    async def get_metrics(self) -> Dict[str, Any]:
+        """Key metrics across all sectors"""
+        snapshot = await self.get_snapshot()
+        return snapshot['metrics']
+    
+    async def get_sector_overview(self, sector: str) -> Dict[str, Any]:
+        """One sector's slice of the overview"""
+        snapshot = await self.get_snapshot()
+        sector_overview = snapshot['overview'].get(sector)
+        if not isinstance(sector_overview, dict):
+            raise ValueError(f"No overview available for sector: {sector}")
+        return sector_overview
+    
+    async def get_snapshot(self) -> Dict[str, Any]:
+        """The versioned overview snapshot with its derived views, rebuilt only when stale
+
+        Every dashboard endpoint reads this one snapshot, so the sectors are loaded and
+        the summary computed once per data change rather than once per request.
+        """
+        snapshot = self.cache.get('overview')
+        if snapshot is not None and not self._is_snapshot_stale():
+            return snapshot
+        
+        async with self._snapshot_lock:
+            # Another request may have rebuilt it while we waited
+            snapshot = self.cache.get('overview')
+            if snapshot is None or self._is_snapshot_stale():
+                snapshot = await self._rebuild_snapshot(snapshot)
+        return snapshot
+    
+    async def on_data_change(self, source: str, data: Any):
+        """Scheduler listener: rebuild the snapshot as soon as any source changes"""
+        logger.info(f"Dashboard snapshot invalidated by {source} update")
+        self._snapshot_stale = True
+        await self.get_snapshot()
+    
+    def subscribe_changes(self, maxsize: int = 32) -> asyncio.Queue:
+        """Queue receiving {'version', 'base_version', 'patch'} for every new snapshot version
+
+        A client too slow to drain its queue gets None instead of the dropped
+        patches, meaning it must resynchronise from the full snapshot.
+        """
+        queue = asyncio.Queue(maxsize=maxsize)
+        self._change_queues.append(queue)
+        return queue
+    
+    def unsubscribe_changes(self, queue: asyncio.Queue):
+        if queue in self._change_queues:
+            self._change_queues.remove(queue)
+    
+    def _publish_change(self, previous: Dict[str, Any], snapshot: Dict[str, Any]):
+        if not self._change_queues:
+            return
+        change = {
+            'version': snapshot['version'],
+            'base_version': previous['version'],
+            'patch': json_patch(previous['overview'], snapshot['overview'])
+        }
+        for queue in self._change_queues:
+            try:
+                queue.put_nowait(change)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+    
+    def _is_snapshot_stale(self) -> bool:
+        return self._snapshot_stale or time.monotonic() - self._snapshot_built_at > self.snapshot_max_age
+    
+    async def _rebuild_snapshot(self, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        self._snapshot_stale = False
+        try:
+            overview = await self._build_overview()
+        except Exception:
+            if previous is None:
+                raise
+            # Keep serving the last good snapshot
+            self._snapshot_built_at = time.monotonic()
+            return previous
+        
+        content_hash = fingerprint(overview)
+        if previous is not None and previous['content_hash'] == content_hash:
+            version = previous['version']
+        else:
+            version = (previous['version'] if previous else 0) + 1
+        
+        snapshot = {
+            'version': version,
+            'content_hash': content_hash,
+            'built_at': datetime.utcnow().isoformat(),
+            'overview': overview,
+            'alerts': self._collect_alerts(overview),
+            'metrics': self._collect_metrics(overview)
+        }
+        self.cache['overview'] = snapshot
+        self._snapshot_built_at = time.monotonic()
+        if previous is not None and version != previous['version']:
+            self._publish_change(previous, snapshot)
+        return snapshot
+    
+    def _collect_alerts(self, overview: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Alerts from every sector, tagged with their sector and sorted by severity"""
+        alerts = []
+        for sector, data in overview.items():
+            if sector not in ['last_updated', 'summary'] and isinstance(data, dict):
+                for alert in data.get('alerts', []):
+                    if isinstance(alert, dict):
+                        alerts.append({**alert, 'sector': sector})
+        
+        severity_order = {'critical': 0, 'high': 1, 'warning': 2, 'info': 3}
+        alerts.sort(key=lambda x: severity_order.get(x.get('severity', 'info'), 3))
+        return alerts
+    
+    def _collect_metrics(self, overview: Dict[str, Any]) -> Dict[str, Any]:
+        """Headline numbers per sector"""
+        transportation = overview.get('transportation', {})
+        finance = overview.get('finance', {})
+        return {
+            "transportation": {
+                "delay_percentage": transportation.get('delay_percentage', 0),
+                "major_issues": len(transportation.get('major_issues', []))
+            },
+            "finance": {
+                "ftse_change": finance.get('ftse_change', 0),
+                "market_trend": finance.get('trend', 'stable')
+            }
+        }
+    
+    async def _build_overview(self) -> Dict[str, Any]:
+        """Load every sector and compute the overview and summary"""
         try:
             # Load data from all sectors concurrently
             transport_data, weather_data, financial_data = await asyncio.gather(
@@ -77,7 +226,8 @@ class DashboardService:
 
             # Prepare TWO different data structures:
             # 1. Chart data for the time-series delay chart
-            chart_data = self._prepare_transport_chart_data(transport_data)
+            delay_history = await self.data_loader.get_transport_delay_series(hours=6)
+            chart_data = self._prepare_transport_chart_data(transport_data, delay_history)
             
             # 2. All services data for displaying individual service statuses
             all_services_data = self._prepare_all_services_data(transport_data)
@@ -164,15 +314,15 @@ class DashboardService:
 
 
 
-    def _prepare_transport_chart_data(self, transport_data: List[Dict]) -> List[Dict]:
+    def _prepare_transport_chart_data(self, transport_data: List[Dict],
+                                      delay_history: Optional[pd.DataFrame] = None) -> List[Dict]:
             
-        """Prepare transport data for charting - FIXED VERSION"""
+        """Prepare transport data for charting: recorded hourly delays plus the current snapshot"""
         if not transport_data or not isinstance(transport_data, list):
             return []
         
         try:
-            # Calculate overall delay metrics over time (simulated since we have real-time data)
-            # For real-time data, we'll create a summary of current delays
+            # Summarize the current snapshot
             current_time = datetime.utcnow()
             
             # Calculate current delay statistics
@@ -203,22 +353,16 @@ class DashboardService:
             
             avg_delay = total_delay / delayed_count if delayed_count > 0 else 0
             
-            # Create time-series data for the chart (last 6 hours simulated)
+            # Time series for the chart from the recorded history (hourly buckets)
             chart_data = []
-            for i in range(6):
-                # Simulate some variation in delays over time
-                time_point = current_time - timedelta(hours=(5 - i))
-                
-                # Add some realistic variation to the average delay
-                variation = np.random.uniform(-5, 5)  # Small random variation
-                delay_value = max(0, avg_delay + variation)
-                
-                chart_data.append({
-                    'timestamp': time_point.isoformat(),
-                    'value': round(delay_value, 1),  # Average delay in minutes
-                    'delayed_services': delayed_count,  # Number of delayed services
-                    'max_delay': round(max_delay, 1)  # Maximum delay
-                })
+            if delay_history is not None and not delay_history.empty:
+                for point in delay_history.itertuples(index=False):
+                    chart_data.append({
+                        'timestamp': point.timestamp.isoformat(),
+                        'value': round(float(point.value), 1),  # Average delay in minutes
+                        'delayed_services': int(point.delayed_services),  # Number of delayed services
+                        'max_delay': round(float(point.max_delay), 1)  # Maximum delay
+                    })
             
             # Add current data point
             chart_data.append({
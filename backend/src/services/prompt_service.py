@@ -2,14 +2,26 @@
 import pandas as pd
 import numpy as np
 import re
+import os
 import json
-from typing import Dict, List, Any, Optional
+import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Any, Optional
 from modules.ai_analyzer import AIAnalyzerModule
 from modules.data_loader import DataLoaderModule
+from utils.cache import PromptResponseCache
+from utils.helpers import fingerprint
 import logging
 
 logger = logging.getLogger(__name__)
 
+# DataLoaderModule cache source behind each sector, for the response cache TTL
+SECTOR_SOURCES = {
+    'transportation': 'transport',
+    'weather': 'weather',
+    'finance': 'finance'
+}
+
 class JSONEncoder(json.JSONEncoder):
     """Custom JSON encoder to handle non-serializable values"""
     def default(self, obj):
@@ -38,6 +50,13 @@ class PromptService:
             'social_media': ['social media', 'twitter', 'facebook', 'engagement', 'trending']
         }
         self.json_encoder = JSONEncoder()
+        # Finished analyses, reused while the sector data they describe is unchanged
+        self.response_cache = PromptResponseCache(
+            max_entries=int(os.getenv('PROMPT_CACHE_MAX_ENTRIES', '256')),
+            similarity=float(os.getenv('PROMPT_CACHE_SIMILARITY', '1.0'))
+        )
+        # A multi-sector prompt returns whatever finished within this many seconds per sector
+        self.sector_timeout = float(os.getenv('PROMPT_SECTOR_TIMEOUT', '20'))
     
     async def analyze_prompt(self, prompt: str, sector: str = None) -> Dict[str, Any]:
         """Analyze user prompt and generate insights"""
@@ -66,15 +85,98 @@ class PromptService:
             })
     
 
+    async def stream_prompt(self, prompt: str, sector: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """analyze_prompt as a stream of JSON-serializable events
+
+        'summary' (data summary, visualizations, confidence) is sent as soon as the
+        data is loaded, then 'insight' deltas as the model writes them, then
+        'recommendations' and finally 'done' with related questions. Prompts that
+        span several sectors are answered whole, as a single 'result' event. If the
+        model stream fails, an 'error' event (with 'partial' set when some of the
+        model's answer was sent) precedes the rest; like analyze_prompt, only a
+        complete model answer is cached.
+        """
+        if not sector:
+            sector = self._detect_sector_from_prompt(prompt)
+        if not sector:
+            yield {'type': 'result', **await self.analyze_prompt(prompt)}
+            return
+        
+        sector_data = await self._load_sector_data(sector)
+        yield self._make_json_serializable({
+            'type': 'summary',
+            'sector': sector,
+            'prompt': prompt,
+            'data_summary': self._summarize_data(sector_data),
+            'visualizations': await self._generate_visualizations(sector_data, prompt),
+            'confidence_score': float(self._calculate_confidence(sector_data, prompt))
+        })
+        
+        data_version = fingerprint(sector_data)
+        cached = self.response_cache.get(prompt, sector, data_version)
+        if cached is not None:
+            logger.info(f"Prompt cache hit for {sector}")
+            yield {'type': 'insight', 'delta': cached['insights']}
+            yield self._make_json_serializable({'type': 'recommendations', 'recommendations': cached['recommendations']})
+            yield self._make_json_serializable({'type': 'done', 'related_questions': cached['related_questions']})
+            return
+        
+        insights = ''
+        analysis = {}
+        async with aclosing(self.ai_analyzer.stream_analysis(prompt, sector, data=sector_data)) as events:
+            async for event in events:
+                if event['type'] == 'insight':
+                    insights += event['delta']
+                    yield event
+                elif event['type'] == 'recommendations':
+                    analysis = event
+                    if 'error' in event:
+                        yield {
+                            'type': 'error',
+                            'detail': 'AI analysis was interrupted; the answer may be incomplete',
+                            'partial': event['partial']
+                        }
+        
+        # Same data-context footer as the non-streaming response
+        recommendations = analysis.get('recommendations', [])
+        enhanced_insights = await self._enhance_insights(insights, sector_data, prompt)
+        if len(enhanced_insights) > len(insights):
+            yield {'type': 'insight', 'delta': enhanced_insights[len(insights):]}
+        yield self._make_json_serializable({'type': 'recommendations', 'recommendations': recommendations})
+        
+        related_questions = await self._suggest_related_questions(prompt, sector)
+        yield {'type': 'done', 'related_questions': related_questions}
+        
+        # Same rule as analyze_prompt: model failures and basic-mode answers are not cached
+        if self._cacheable(analysis) and not sector_data.empty:
+            result = {
+                'sector': sector,
+                'prompt': prompt,
+                'insights': enhanced_insights,
+                'data_summary': self._summarize_data(sector_data),
+                'visualizations': await self._generate_visualizations(sector_data, prompt),
+                'recommendations': recommendations,
+                'related_questions': related_questions,
+                'confidence_score': float(self._calculate_confidence(sector_data, prompt))
+            }
+            self.response_cache.put(prompt, sector, data_version, result, self._response_ttl(sector))
+    
     async def _analyze_sector_prompt(self, prompt: str, sector: str) -> Dict[str, Any]:
         """Analyze prompt for a specific sector"""
         try:
-            # Load relevant data
+            # Load relevant data once; analysis, summary, visualizations and confidence
+            # all describe this same snapshot
             sector_data = await self._load_sector_data(sector)
             
+            # Same question about the same data snapshot: answer from the cache
+            data_version = fingerprint(sector_data)
+            cached = self.response_cache.get(prompt, sector, data_version)
+            if cached is not None:
+                logger.info(f"Prompt cache hit for {sector}")
+                return {**cached, 'prompt': prompt}
             
             # Use AI analyzer to generate insights
-            analysis_result = await self.ai_analyzer.analyze_data(prompt, sector)
+            analysis_result = await self.ai_analyzer.analyze_data(prompt, sector, data=sector_data)
             
             # Enhance with additional context
             enhanced_insights = await self._enhance_insights(
@@ -94,12 +196,25 @@ class PromptService:
                 'confidence_score': float(self._calculate_confidence(sector_data, prompt))
             }
             
+            # Failed or fallback analyses and empty loads are retried next time rather than cached
+            if self._cacheable(analysis_result) and not sector_data.empty:
+                self.response_cache.put(prompt, sector, data_version, result, self._response_ttl(sector))
             return result
             
         except Exception as e:
             logger.error(f"Error in sector analysis for {sector}: {e}")
             return await self._get_fallback_response(prompt, sector, str(e))
     
+    @staticmethod
+    def _cacheable(analysis: Dict[str, Any]) -> bool:
+        """Only a complete model answer is cached; basic-mode fallbacks and failures are not"""
+        return bool(analysis.get('ai_used')) and 'error' not in analysis
+    
+    def _response_ttl(self, sector: str) -> float:
+        """Keep an answer no longer than its data source stays fresh"""
+        source = SECTOR_SOURCES.get(sector)
+        return self.data_loader.cache.ttls.get(source, 300)
+    
     def _make_json_serializable(self, data: Any) -> Any:
         """Recursively make data JSON serializable"""
         if isinstance(data, dict):
@@ -307,13 +422,22 @@ class PromptService:
                 ]
             }
         
-        sector_analyses = {}
-        for sector in detected_sectors:
+        # Sectors run concurrently; their LLM calls still share the analyzer's semaphore
+        timed_out = []
+        
+        async def analyze_sector(sector: str) -> Dict[str, Any]:
             try:
-                sector_analyses[sector] = await self._analyze_sector_prompt(prompt, sector)
+                return await asyncio.wait_for(self._analyze_sector_prompt(prompt, sector), timeout=self.sector_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Analysis of {sector} timed out after {self.sector_timeout:.0f}s")
+                timed_out.append(sector)
+                return await self._get_fallback_response(prompt, sector, f"analysis timed out after {self.sector_timeout:.0f}s")
             except Exception as e:
                 logger.error(f"Error analyzing sector {sector}: {e}")
-                sector_analyses[sector] = await self._get_fallback_response(prompt, sector, str(e))
+                return await self._get_fallback_response(prompt, sector, str(e))
+        
+        results = await asyncio.gather(*(analyze_sector(sector) for sector in detected_sectors))
+        sector_analyses = dict(zip(detected_sectors, results))
         
         cross_sector_insights = await self._generate_cross_sector_insights(prompt, sector_analyses)
         
@@ -321,7 +445,8 @@ class PromptService:
             'sectors': detected_sectors,
             'cross_sector_insights': cross_sector_insights,
             'sector_analyses': sector_analyses,
-            'integrated_recommendations': await self._integrate_recommendations(sector_analyses)
+            'integrated_recommendations': await self._integrate_recommendations(sector_analyses),
+            'timed_out_sectors': timed_out
         }
         
         return self._make_json_serializable(result)
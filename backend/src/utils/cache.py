@@ -0,0 +1,257 @@
+import re
+import asyncio
+import time
+import logging
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Words that never change what a prompt asks; every other token (numbers, tickers,
+# line names, most/least, rose/fell...) must match exactly for a near hit
+PROMPT_STOPWORDS = frozenset({
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'been', 'do', 'does', 'did',
+    'of', 'on', 'in', 'at', 'to', 'for', 'with', 'from', 'by', 'about', 'and',
+    'please', 'me', 'us', 'i', 'we', 'you', 'can', 'could', 'would', 'will',
+    'show', 'tell', 'give', 'what', 'whats', 's', 'there', 'any', 'right', 'now', 'currently'
+})
+
+
+class CacheEntry:
+    """A cached value and the monotonic time it was fetched"""
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight task
+
+    Followers await the leader's task through asyncio.shield, so a caller that is
+    cancelled (e.g. a disconnected client) never cancels the shared upstream load.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._coalesced: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or join the run already in flight for the same key"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            group = key[0] if isinstance(key, tuple) else key
+            self._coalesced[group] = self._coalesced.get(group, 0) + 1
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[Hashable, int]:
+        """Number of callers that joined an existing flight, per key group"""
+        return dict(self._coalesced)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+class SourceCache:
+    """Per-source TTL cache with stale-while-revalidate semantics
+
+    A fresh entry (younger than the source TTL) is served directly. A stale entry
+    (within the stale window after the TTL) is served immediately while a single
+    background task refreshes it. Anything older is reloaded inline. Loaders return
+    None on upstream failure; failures are never cached and the last good value is
+    served instead when one exists.
+    """
+
+    def __init__(self, ttls: Dict[str, float], stale_windows: Dict[str, float]):
+        self.ttls = ttls
+        self.stale_windows = stale_windows
+        self._entries: Dict[Tuple[Hashable, ...], CacheEntry] = {}
+        self._refresh_tasks: Dict[Tuple[Hashable, ...], asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    async def get_or_load(
+        self,
+        source: str,
+        loader: Callable[[], Awaitable[Optional[Any]]],
+        params: Tuple[Hashable, ...] = ()
+    ) -> Optional[Any]:
+        """Return the cached value for source/params, loading it if needed"""
+        key = (source, *params)
+        entry = self._entries.get(key)
+        ttl = self.ttls.get(source, 0)
+
+        if entry is not None:
+            age = entry.age()
+            if age < ttl:
+                self._count(source, 'hits')
+                return entry.value
+            if age < ttl + self.stale_windows.get(source, 0):
+                self._count(source, 'stale_hits')
+                self._schedule_refresh(key, source, loader)
+                return entry.value
+
+        self._count(source, 'misses')
+        return await self._load(key, source, loader)
+
+    async def refresh(
+        self,
+        source: str,
+        loader: Callable[[], Awaitable[Optional[Any]]],
+        params: Tuple[Hashable, ...] = ()
+    ) -> Optional[Any]:
+        """Reload source/params now regardless of age
+
+        Returns the new value, or None if the load failed (the previous entry is kept).
+        """
+        self._count(source, 'refreshes')
+        value = await self._fetch(source, loader)
+        if value is None:
+            return None
+        self._entries[(source, *params)] = CacheEntry(value, time.monotonic())
+        return value
+
+    def invalidate(self, source: Optional[str] = None):
+        """Drop cached entries for one source, or all sources"""
+        for key in list(self._entries):
+            if source is None or key[0] == source:
+                del self._entries[key]
+
+    def get_entry(self, source: str, params: Tuple[Hashable, ...] = ()) -> Optional[CacheEntry]:
+        """Return the raw cache entry without touching counters"""
+        return self._entries.get((source, *params))
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters and entry ages per source"""
+        stats = {}
+        for source in set(self.ttls) | set(self._stats):
+            counters = dict(self._stats.get(source, {}))
+            ages = [entry.age() for key, entry in self._entries.items() if key[0] == source]
+            counters['entries'] = len(ages)
+            counters['oldest_age_seconds'] = round(max(ages), 1) if ages else None
+            counters['ttl_seconds'] = self.ttls.get(source, 0)
+            stats[source] = counters
+        return stats
+
+    async def _load(self, key, source, loader) -> Optional[Any]:
+        value = await self._fetch(source, loader)
+        if value is None:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+        self._entries[key] = CacheEntry(value, time.monotonic())
+        return value
+
+    async def _fetch(self, source, loader) -> Optional[Any]:
+        try:
+            value = await loader()
+        except Exception as e:
+            logger.error(f"Error loading {source} for cache: {e}")
+            value = None
+
+        if value is None:
+            self._count(source, 'errors')
+        return value
+
+    def _schedule_refresh(self, key, source, loader):
+        task = self._refresh_tasks.get(key)
+        if task is not None and not task.done():
+            return
+
+        async def refresh():
+            try:
+                self._count(source, 'refreshes')
+                await self._load(key, source, loader)
+            finally:
+                self._refresh_tasks.pop(key, None)
+
+        self._refresh_tasks[key] = asyncio.create_task(refresh())
+
+    def _count(self, source: str, counter: str):
+        counters = self._stats.setdefault(
+            source, {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0}
+        )
+        counters[counter] += 1
+
+
+class PromptResponseCache:
+    """LRU cache of finished prompt analyses, keyed on the data they were computed from
+
+    Keys are (sector, data version, normalized prompt), so an answer is only
+    reused while the sector data is unchanged. Prompts are normalized (case,
+    punctuation, whitespace) and by default only an identical normalized prompt
+    hits. With `similarity` below 1, a prompt at least that alike to a cached one
+    (difflib ratio) also hits, but only if both have exactly the same tokens once
+    stopwords are dropped: "most"/"least" or BP.L/BARC.L differ by a few
+    characters yet ask different questions.
+    """
+
+    def __init__(self, max_entries: int = 256, similarity: float = 1.0):
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries: 'OrderedDict[Tuple[str, str, str], Tuple[Any, float]]' = OrderedDict()
+        self._stats = {'hits': 0, 'near_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        return ' '.join(re.sub(r'[^\w\s]', ' ', prompt.lower()).split())
+
+    @staticmethod
+    def content_tokens(normalized: str) -> Tuple[str, ...]:
+        return tuple(token for token in normalized.split() if token not in PROMPT_STOPWORDS)
+
+    def get(self, prompt: str, sector: str, version: str) -> Optional[Any]:
+        normalized = self.normalize(prompt)
+        key = (sector, version, normalized)
+        entry = self._live_entry(key)
+        if entry is not None:
+            self._stats['hits'] += 1
+            return entry
+
+        if self.similarity < 1:
+            content = self.content_tokens(normalized)
+            for candidate in list(self._entries):
+                if candidate[:2] != (sector, version) or self.content_tokens(candidate[2]) != content:
+                    continue
+                matcher = SequenceMatcher(None, normalized, candidate[2])
+                # quick_ratio is a cheap upper bound; only compute ratio when it could pass
+                if matcher.quick_ratio() >= self.similarity and matcher.ratio() >= self.similarity:
+                    entry = self._live_entry(candidate)
+                    if entry is not None:
+                        self._stats['near_hits'] += 1
+                        return entry
+
+        self._stats['misses'] += 1
+        return None
+
+    def put(self, prompt: str, sector: str, version: str, value: Any, ttl: float):
+        key = (sector, version, self.normalize(prompt))
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self._stats, 'entries': len(self._entries)}
+
+    def _live_entry(self, key: Tuple[str, str, str]) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
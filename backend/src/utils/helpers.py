@@ -1,8 +1,23 @@
 import asyncio
+import hashlib
+import json
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple, Union
 import pandas as pd
 
+# Sector of each tracked LSE symbol; anything unlisted is reported as 'Other'
+COMPANY_SECTORS = {
+    'HSBA.L': 'Banking',
+    'BARC.L': 'Banking', 
+    'LLOY.L': 'Banking',
+    'BP.L': 'Energy',
+    'RIO.L': 'Mining',
+    'GSK.L': 'Pharmaceuticals',
+    'AZN.L': 'Pharmaceuticals',
+    'ULVR.L': 'Consumer Goods',
+    'TSCO.L': 'Retail'
+}
+
 async def async_retry(func, max_retries=3, delay=1):
     """Retry decorator for async functions"""
     for attempt in range(max_retries):
@@ -18,6 +33,20 @@ def validate_timeframe(timeframe: str) -> bool:
     valid_timeframes = ['1h', '24h', '7d', '30d', '90d', '1y']
     return timeframe in valid_timeframes
 
+def parse_windows(windows: Optional[Union[str, List[int]]], max_window: int = 365) -> Optional[Tuple[int, ...]]:
+    """Parse moving-average windows given as "7,20,50" or a list of ints"""
+    if windows is None or windows == '' or windows == []:
+        return None
+    if isinstance(windows, str):
+        windows = [part for part in windows.split(',') if part.strip()]
+    try:
+        parsed = sorted({int(window) for window in windows})
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid windows: {windows}")
+    if not parsed or parsed[0] < 2 or parsed[-1] > max_window:
+        raise ValueError(f"Windows must be between 2 and {max_window} days")
+    return tuple(parsed)
+
 def sanitize_sector_name(sector: str) -> str:
     """Sanitize and normalize sector names"""
     sector_map = {
@@ -29,4 +58,60 @@ def sanitize_sector_name(sector: str) -> str:
         'ecommerce': 'ecommerce',
         'social': 'social media'
     }
-    return sector_map.get(sector.lower(), sector.lower())
\ No newline at end of file
+    return sector_map.get(sector.lower(), sector.lower())
+
+def get_company_sector(symbol: str) -> str:
+    """Get company sector for categorization"""
+    return COMPANY_SECTORS.get(symbol, 'Other')
+
+# Keys whose values change on every rebuild even when the data has not
+VOLATILE_KEYS = ('timestamp', 'last_updated', 'summary_timestamp')
+
+def fingerprint(payload: Any, volatile_keys=VOLATILE_KEYS) -> str:
+    """Stable content hash of a JSON-like payload or DataFrame, ignoring volatile timestamp keys"""
+    if isinstance(payload, pd.DataFrame):
+        stable = payload.drop(columns=[col for col in volatile_keys if col in payload.columns])
+        encoded = stable.to_json(orient='split', date_format='iso', default_handler=str)
+        return hashlib.sha1(encoded.encode()).hexdigest()
+    
+    def strip(value):
+        if isinstance(value, dict):
+            return {key: strip(item) for key, item in value.items() if key not in volatile_keys}
+        if isinstance(value, (list, tuple)):
+            return [strip(item) for item in value]
+        return value
+    
+    encoded = json.dumps(strip(payload), sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode()).hexdigest()
+
+def json_patch(old: Any, new: Any, path: str = '') -> List[Dict[str, Any]]:
+    """RFC 6902 operations turning JSON-like `old` into `new`
+
+    Dicts and equal-length lists are diffed member by member; a list that grew or
+    shrank is replaced whole, which keeps the patch valid without a sequence diff.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f"{path}/{_pointer_token(key)}"})
+        for key, value in new.items():
+            member = f"{path}/{_pointer_token(key)}"
+            if key not in old:
+                ops.append({'op': 'add', 'path': member, 'value': value})
+            else:
+                ops.extend(json_patch(old[key], value, member))
+        return ops
+    
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            ops.extend(json_patch(old_item, new_item, f"{path}/{index}"))
+        return ops
+    
+    if type(old) is not type(new) or old != new:
+        return [{'op': 'replace', 'path': path, 'value': new}]
+    return []
+
+def _pointer_token(key: Any) -> str:
+    return str(key).replace('~', '~0').replace('/', '~1')
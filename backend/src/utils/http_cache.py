@@ -0,0 +1,50 @@
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from utils.helpers import fingerprint
+
+
+def cache_control(max_age: float, stale_while_revalidate: float = 0) -> str:
+    """Cache-Control value letting browsers and the nginx proxy reuse a response"""
+    value = f"public, max-age={int(max_age)}"
+    if stale_while_revalidate:
+        value += f", stale-while-revalidate={int(stale_while_revalidate)}"
+    return value
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag"""
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison: GZipMiddleware re-encodes the body, so W/ prefixes are ignored
+    candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return etag.removeprefix('W/') in candidates
+
+
+def conditional_json_response(
+    request: Request,
+    payload: Any,
+    max_age: float,
+    stale_while_revalidate: float = 0,
+    content_hash: Optional[str] = None
+) -> Response:
+    """JSON response with a content-hash ETag, or an empty 304 if the client has it
+
+    The ETag is content_hash when the caller already has one (e.g. a snapshot
+    version hash), otherwise a fingerprint of payload that ignores timestamps, so
+    an unchanged poll is answered without serializing or compressing the body.
+    """
+    etag = f'W/"{content_hash or fingerprint(payload)}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': cache_control(max_age, stale_while_revalidate)
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=jsonable_encoder(payload), headers=headers)